@@ -8,7 +8,10 @@ from typing import Dict, List, Union, Tuple
 class SuperProAnalyzer:
     """Class to analyze and visualize SuperPro Designer JSON output files."""
     
-    def __init__(self):
+    def __init__(self, debug: bool = False):
+        # Print [DEBUG] messages only when enabled
+        self.debug = debug
+
         # Standard cost categories matching chart_generation_multiple
         self.standard_cost_categories = [
             'Raw materials (OPEX)', 
@@ -79,6 +82,26 @@ class SuperProAnalyzer:
                 
         return process_data
 
+    @staticmethod
+    def index_cells(cells: List[Dict]) -> Tuple[Dict[int, Dict[int, str]], List[Tuple[int, str]]]:
+        """
+        Index the cells in a single pass.
+        
+        Args:
+            cells: List of cell data from JSON
+            
+        Returns:
+            Tuple of (row -> {column: value} map, ordered list of (row, value) for column 1)
+        """
+        rows = {}
+        first_column = []
+        for cell in cells:
+            value = str(cell.get('value', ''))
+            rows.setdefault(cell['row'], {})[cell['column']] = value
+            if cell['column'] == 1:
+                first_column.append((cell['row'], value))
+        return rows, first_column
+
     def identify_sections(self, cells: List[Dict]) -> List[str]:
         """
         Identify process sections from the JSON data.
@@ -107,7 +130,8 @@ class SuperProAnalyzer:
                 if value not in ["Section", ""]:
                     sections.append(value)
 
-        print(f"[DEBUG] Identified sections: {sections}")
+        if self.debug:
+            print(f"[DEBUG] Identified sections: {sections}")
         return sections
 
     def extract_cost_data(self, data: Dict, cost_type: str = 'yearly') -> Tuple[Dict, List[str]]:
@@ -116,10 +140,12 @@ class SuperProAnalyzer:
         
         Args:
             data: Parsed JSON data
-            cost_type: Type of cost to extract ('yearly', 'per_unit', or 'percentage')
+            cost_type: Type of cost to extract ('yearly', 'per_unit', or 'percentage'),
+                or 'all' to extract every type from the same pass
             
         Returns:
-            Tuple of (cost_data_dict, sections_list)
+            Tuple of (cost_data_dict, sections_list). With cost_type='all' the
+            cost data dict maps each cost type to its own cost_data_dict.
         """
         cells = data['Table p. 1']['cells']
         sections = self.identify_sections(cells)
@@ -129,39 +155,48 @@ class SuperProAnalyzer:
             return {}, []
 
         print(f"[INFO] Extracting cost data for sections: {sections}")
-        # Initialize cost data dictionary with mapped category names
-        cost_data = {section: {cat: 0.0 for cat in self.standard_cost_categories} for section in sections}
-
-        cost_col_name, cost_col = self.cost_columns[cost_type]
+        cost_types = list(self.cost_columns) if cost_type == 'all' else [cost_type]
+        rows, first_column = self.index_cells(cells)
+        section_set = set(sections)
+
+        # Initialize cost data dictionaries with mapped category names
+        all_cost_data = {
+            ctype: {section: {cat: 0.0 for cat in self.standard_cost_categories} for section in sections}
+            for ctype in cost_types
+        }
         current_section = None
 
-        for i, cell in enumerate(cells):
-            value = str(cell.get('value', ''))
-
+        for row, value in first_column:
             # Track current section
-            if cell['column'] == 1 and value in sections:
+            if value in section_set:
                 current_section = value
-                print(f"[DEBUG] Current section: {current_section}")
+                if self.debug:
+                    print(f"[DEBUG] Current section: {current_section}")
                 continue
 
             # Extract costs for current section using category mapping
-            if current_section and cell['column'] == 1 and value in self.category_mapping:
+            if current_section and value in self.category_mapping:
                 mapped_category = self.category_mapping[value]
-                row = cell['row']
-
-                # Find corresponding cost value
-                for cost_cell in cells:
-                    if cost_cell['row'] == row and cost_cell['column'] == cost_col:
-                        try:
-                            cost_value = float(str(cost_cell['value']).replace(',', ''))
-                            cost_data[current_section][mapped_category] = cost_value
-                            print(f"[DEBUG] Extracted cost - Section: {current_section}, Category: {mapped_category}, Value: {cost_value}")
-                        except (ValueError, TypeError):
-                            print(f"Warning: Invalid cost value for {mapped_category} in {current_section}", file=sys.stderr)
-                        break
-
-        print(f"[INFO] Cost data extracted: {cost_data}")
-        return cost_data, sections
+                row_values = rows[row]
+
+                for ctype in cost_types:
+                    cost_col_name, cost_col = self.cost_columns[ctype]
+                    if cost_col not in row_values:
+                        continue
+                    try:
+                        cost_value = float(row_values[cost_col].replace(',', ''))
+                        all_cost_data[ctype][current_section][mapped_category] = cost_value
+                        if self.debug:
+                            print(f"[DEBUG] Extracted cost - Section: {current_section}, Category: {mapped_category}, Type: {ctype}, Value: {cost_value}")
+                    except (ValueError, TypeError):
+                        print(f"Warning: Invalid cost value for {mapped_category} in {current_section}", file=sys.stderr)
+
+        if cost_type != 'all':
+            all_cost_data = all_cost_data[cost_type]
+        print(f"[INFO] Cost data extracted for {len(sections)} sections and {len(cost_types)} cost types")
+        if self.debug:
+            print(f"[DEBUG] Cost data: {all_cost_data}")
+        return all_cost_data, sections
 
     def create_comparison_chart(self, all_process_data: Dict, output_path: str):
         """
@@ -188,7 +223,8 @@ class SuperProAnalyzer:
 
         # Convert set to list to maintain order
         all_sections = list(all_sections)
-        print(f"[DEBUG] All sections before sorting: {all_sections}")
+        if self.debug:
+            print(f"[DEBUG] All sections before sorting: {all_sections}")
 
         # Sort sections by total cost
         section_totals = {
@@ -201,7 +237,8 @@ class SuperProAnalyzer:
             for section in all_sections
         }
         all_sections = sorted(all_sections, key=lambda x: section_totals.get(x, 0), reverse=True)
-        print(f"[DEBUG] All sections after sorting: {all_sections}")
+        if self.debug:
+            print(f"[DEBUG] All sections after sorting: {all_sections}")
 
         # Set up the plot with matching style
         fig, ax = plt.subplots(figsize=(14, 10))
@@ -210,20 +247,23 @@ class SuperProAnalyzer:
         n_processes = len(processes)
         bar_width = 0.6 / n_processes
         indices = np.arange(len(all_sections))
-        print(f"[DEBUG] Indices for sections: {indices}")
+        if self.debug:
+            print(f"[DEBUG] Indices for sections: {indices}")
 
         # Create stacked bars for each process
         for p_idx, process in enumerate(processes):
             bottom = np.zeros(len(all_sections))
             cost_data = process_costs[process]
             print(f"[INFO] Plotting data for process: {process}")
-            print(f"[DEBUG] Cost data: {cost_data}")
+            if self.debug:
+                print(f"[DEBUG] Cost data: {cost_data}")
 
             # Plot bars for each category in standard order
             for cat_idx, category in enumerate(self.standard_cost_categories):
                 values = [cost_data.get(section, {}).get(category, 0) for section in all_sections]
                 offset = p_idx * bar_width - (n_processes - 1) * bar_width / 2
-                print(f"[DEBUG] Values for category '{category}' in process '{process}': {values}")
+                if self.debug:
+                    print(f"[DEBUG] Values for category '{category}' in process '{process}': {values}")
 
                 ax.bar(indices + offset, values, bar_width, bottom=bottom,
                        label=category if p_idx == 0 else "",
@@ -231,12 +271,14 @@ class SuperProAnalyzer:
                        edgecolor='white', linewidth=0.5)
 
                 bottom += values
-                print(f"[DEBUG] Updated bottom for stacking: {bottom}")
+                if self.debug:
+                    print(f"[DEBUG] Updated bottom for stacking: {bottom}")
 
         # Customize chart appearance to match chart_generation_multiple
         ax.set_xticks(indices)
         ax.set_xticklabels(all_sections, rotation=45, ha='right', fontsize=10)
-        print(f"[DEBUG] Set x-tick labels: {all_sections}")
+        if self.debug:
+            print(f"[DEBUG] Set x-tick labels: {all_sections}")
         ax.set_ylabel(f'Unit Production Cost [€ kg⁻¹]', fontsize=12)
         ax.set_title('Comparative Unit Production Cost', fontsize=14, fontweight='bold')
 
@@ -0,0 +1,71 @@
+"""Benchmark retrieval latency of the local manual index.
+
+Builds an index over a synthetic manual (chunks of process-engineering vocabulary
+following a Zipf distribution) and times single hybrid searches and a batch of
+queries, with the index loaded memory-mapped as the chatbot does.
+
+Usage: python benchmarks/bench_manual_index.py [--chunks 5000 20000] [--queries 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.manual_index import ManualIndex, build_index
+
+TERMS = ("batch procedure operation equipment vessel scheduling cycle time campaign setup turnaround "
+         "fermentor centrifuge chromatography column buffer media storage tank cleaning cip sip "
+         "throughput bottleneck utilization staggered mode annual operating cost capital labor "
+         "utilities consumables simulation flowsheet stream component mass balance recipe "
+         "duration start end offset resource pool unit procedure sizing design rating").split()
+
+def synthetic_chunks(count, words=180, seed=0):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, size=(count, words)), len(TERMS)) - 1
+    return [' '.join(TERMS[i] for i in row) for row in ranks]
+
+def synthetic_queries(count, seed=1):
+    rng = np.random.default_rng(seed)
+    return [f"How do I set the {' '.join(rng.choice(TERMS, 3))}?" for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, nargs='+', default=[5_000, 20_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=30)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries)
+    print(f"{'chunks':>7} {'build (s)':>10} {'load (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'batch/query (ms)':>17}")
+    for count in args.chunks:
+        with tempfile.TemporaryDirectory() as path:
+            start = time.perf_counter()
+            build_index(synthetic_chunks(count), path)
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = ManualIndex(path)
+            load_time = time.perf_counter() - start
+
+            index.search(queries[0], args.limit)  # Page in the memory-mapped arrays
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, args.limit)
+                latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.search_many(queries, args.limit)
+            batch_time = (time.perf_counter() - start) / len(queries)
+
+            p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+            print(f"{count:>7} {build_time:>10.2f} {load_time * 1000:>10.1f} {p50:>9.2f} {p95:>9.2f} "
+                  f"{batch_time * 1000:>17.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark the Markdown to DOCX conversion of the report pages.
+
+Generates a report of about --pages pages (headings, paragraphs with bold and italic
+text, bullet and numbered lists and, in the new converter, tables) and converts it
+with utils.markdown_docx and with the former converter of the Techno-Economic Report
+Generator, which tokenized inline formatting character by character.
+
+Usage: python benchmarks/bench_markdown_docx.py [--pages 200] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from docx.shared import Pt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.markdown_docx import add_markdown, create_document
+
+WORDS = ("the process yield capital cost of the fermentation step depends on titer and batch "
+         "time while downstream purification dominates operating cost").split()
+
+def sentence(index, words=18):
+    text = ' '.join(WORDS[(index + i) % len(WORDS)] for i in range(words))
+    return text.replace('yield', '**yield**', 1).replace('titer', '*titer*', 1).capitalize() + '.'
+
+def generated_report(pages, tables=True):
+    """About one page per section: heading, paragraphs, lists and a numeric table"""
+    parts = []
+    for page in range(pages):
+        parts.append(f"# {page + 1}. Section {page + 1}\n")
+        parts.append(f"## {page + 1}.1 Overview\n")
+        for paragraph in range(3):
+            parts.append('\n'.join(sentence(page + paragraph * 3 + line) for line in range(3)) + '\n')
+        parts.append('\n'.join(f"- {sentence(page + item, 10)}" for item in range(5)) + '\n')
+        parts.append('\n'.join(f"{item + 1}. {sentence(page + item, 8)}" for item in range(4)) + '\n')
+        if tables:
+            rows = [f"| P-{row} | {row * 1.5:.2f} | {row * 12.25:.2f} | **{row % 3}** |" for row in range(6)]
+            parts.append('\n'.join(['| Item | Cost (M$) | Time (h) | Rank |', '|---|---:|---:|---|'] + rows) + '\n')
+    return '\n'.join(parts)
+
+def former_add_markdown(doc, content):
+    """Reference: the former converter of pages/2 (lists, headings, paragraphs, character-by-character emphasis)"""
+    def process_text_formatting(text):
+        parts, current_text, in_bold, in_italic, i = [], "", False, False, 0
+        while i < len(text):
+            if text[i:i+2] == '**' and not in_italic:
+                if in_bold or current_text:
+                    parts.append((current_text, in_bold, False))
+                current_text, in_bold, i = "", not in_bold, i + 2
+            elif text[i:i+1] == '*' and not in_bold:
+                if in_italic or current_text:
+                    parts.append((current_text, False, in_italic))
+                current_text, in_italic, i = "", not in_italic, i + 1
+            else:
+                current_text += text[i]
+                i += 1
+        if current_text:
+            parts.append((current_text, in_bold, in_italic))
+        return parts
+
+    def add_runs(paragraph, text):
+        for part, is_bold, is_italic in process_text_formatting(text):
+            run = paragraph.add_run(part)
+            run.bold = is_bold
+            run.italic = is_italic
+
+    current_paragraph, list_level = None, 0
+    for line in content.split('\n'):
+        line = line.rstrip()
+        if not line:
+            current_paragraph = None
+        elif line.startswith('#'):
+            p = doc.add_paragraph(line.lstrip('#').strip())
+            p.style = f'Heading {min(len(line.split()[0]), 3)}'
+            p.paragraph_format.space_before = Pt(12)
+            current_paragraph = None
+        elif any(line.startswith(f"{n}.") for n in range(1, 10)) and ":" in line:
+            p = doc.add_paragraph(line)
+            p.style = 'Heading 2'
+            p.paragraph_format.space_before = Pt(12)
+            current_paragraph = None
+        elif line.lstrip().startswith(('- ', '* ', *(f"{n}." for n in range(1, 10)))):
+            style = 'List Bullet' if line.lstrip().startswith(('- ', '* ')) else 'List Number'
+            level = (len(line) - len(line.lstrip())) // 2
+            content = line.lstrip('- ').lstrip('* ') if style == 'List Bullet' else line.lstrip('123456789.')
+            if current_paragraph is None or current_paragraph.style.name != style or list_level != level:
+                current_paragraph = doc.add_paragraph()
+                current_paragraph.style = style
+                current_paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
+                list_level = level
+            else:
+                current_paragraph.add_run('\n')
+            add_runs(current_paragraph, content.strip())
+        else:
+            if current_paragraph is None or current_paragraph.style.name in ['List Bullet', 'List Number']:
+                current_paragraph = doc.add_paragraph()
+                current_paragraph.style = 'Normal'
+                list_level = 0
+            else:
+                current_paragraph.add_run('\n')
+            add_runs(current_paragraph, line)
+    return doc
+
+def best_time(func, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # The former converter has no table support, so it is compared on the report without tables
+    plain = generated_report(args.pages, tables=False)
+    full = generated_report(args.pages)
+    former_time, _ = best_time(lambda: former_add_markdown(create_document("Report"), plain), args.repeat)
+    plain_time, _ = best_time(lambda: add_markdown(create_document("Report"), plain, numbered_headings=True),
+                              args.repeat)
+    full_time, doc = best_time(lambda: add_markdown(create_document("Report"), full, numbered_headings=True),
+                               args.repeat)
+    save_time, _ = best_time(lambda: doc.save(io.BytesIO()), args.repeat)
+
+    print(f"{args.pages} pages, {len(plain.splitlines()):,} lines without tables, {len(full.splitlines()):,} with")
+    print(f"former converter (no tables): {former_time:8.3f} s")
+    print(f"markdown_docx (no tables):    {plain_time:8.3f} s  ({former_time / plain_time:.1f}x)")
+    print(f"markdown_docx (with tables):  {full_time:8.3f} s  ({len(doc.paragraphs):,} paragraphs, "
+          f"{len(doc.tables)} tables)")
+    print(f"saving the DOCX:              {save_time:8.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the schedule metrics engine of the Scheduling Analyzer.
+
+Builds synthetic campaigns (operations with overlapping and gapped intervals spread
+over equipment items), checks the vectorized occupancy figures against a per-equipment
+Python interval merge and times compute_schedule_metrics.
+
+Usage: python benchmarks/bench_scheduling_metrics.py [--operations 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scheduling_metrics import compute_schedule_metrics
+from scheduling_parser import SchedulingData
+
+def synthetic_schedule(operations, seed=0):
+    """Campaign with about 8 operations per equipment item, some overlapping, some leaving gaps"""
+    rng = np.random.default_rng(seed)
+    equipment = max(1, operations // 8)
+    setup, process, turnaround = (rng.integers(0, 8, operations) * 0.25 for _ in range(3))
+    ops = pd.DataFrame({
+        'procedure': [f"P-{i}" for i in rng.integers(0, equipment, operations)],
+        'equipment': [f"V-{i}" for i in rng.integers(0, equipment, operations)],
+        'operation': [f"OP-{i}" for i in range(operations)],
+        'setup': setup, 'process': process, 'turnaround': turnaround,
+        'total': setup + process + turnaround,
+        'start': rng.integers(0, 200, operations) * 0.5,
+        'end': np.nan,
+    })
+    empty = pd.DataFrame()
+    return SchedulingData({'Annual Operating Time': '7920 h', 'Batches per Year': '100'}, empty, ops, empty, empty)
+
+def merged_occupancy(ops):
+    """Reference: busy time and occupancy per equipment by merging sorted intervals in Python"""
+    busy, occupancy = {}, {}
+    for name, group in ops.groupby('equipment'):
+        intervals = sorted(zip(group['start'], group['start'] + group['total']))
+        merged = [list(intervals[0])]
+        for start, end in intervals[1:]:
+            if start > merged[-1][1]:
+                merged.append([start, end])
+            else:
+                merged[-1][1] = max(merged[-1][1], end)
+        busy[name] = sum(end - start for start, end in merged)
+        occupancy[name] = merged[-1][1] - merged[0][0]
+    return pd.Series(busy), pd.Series(occupancy)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'operations':>10} {'equipment':>10} {'reference (s)':>14} {'engine (s)':>11}")
+    for operations in args.operations:
+        schedule = synthetic_schedule(operations)
+        start = time.perf_counter()
+        busy, occupancy = merged_occupancy(schedule.operations)
+        reference_time = time.perf_counter() - start
+
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            metrics = compute_schedule_metrics(schedule)
+            best = min(best, time.perf_counter() - start)
+        if not (np.allclose(metrics.equipment['busy'], busy.reindex(metrics.equipment.index))
+                and np.allclose(metrics.equipment['occupancy'], occupancy.reindex(metrics.equipment.index))):
+            raise SystemExit(f"Occupancy mismatch for {operations} operations")
+        print(f"{operations:>10} {len(metrics.equipment):>10} {reference_time:>14.3f} {best:>11.4f}")
+
+if __name__ == "__main__":
+    main()
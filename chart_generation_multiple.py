@@ -1,10 +1,22 @@
+import io
 import json
-import matplotlib.pyplot as plt
+import multiprocessing
+import threading
+import matplotlib
+from matplotlib import font_manager
+from matplotlib.figure import Figure, SubFigure
+from matplotlib.font_manager import FontProperties
+from matplotlib.ticker import FuncFormatter
+from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import os
 import re
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple, Any, Union
+from dataclasses import dataclass, fields, replace
+from excel_reader_for_llm import excel_to_json, read_excel_for_llm
 
 
 @dataclass
@@ -19,6 +31,119 @@ class ProcessData:
     utility_costs: Dict[str, float]
     annual_rate: float
 
+@dataclass
+class CostMatrix:
+    """Columnar cost table: a scenarios × categories float64 matrix plus label arrays"""
+    scenarios: np.ndarray
+    categories: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def from_dicts(cls, scenarios: List[str], costs: List[Dict[str, float]]) -> 'CostMatrix':
+        """Build the matrix from one {category: cost} dict per scenario (missing costs are 0)"""
+        column_index: Dict[str, int] = {}
+        for scenario_costs in costs:
+            for category in scenario_costs:
+                column_index.setdefault(category, len(column_index))
+        
+        values = np.zeros((len(scenarios), len(column_index)), dtype=np.float64)
+        for i, scenario_costs in enumerate(costs):
+            if scenario_costs:
+                columns = [column_index[category] for category in scenario_costs]
+                values[i, columns] = list(scenario_costs.values())
+        
+        return cls(
+            scenarios=np.array(scenarios, dtype=object),
+            categories=np.array(list(column_index), dtype=object),
+            values=values
+        )
+
+    def sorted_by_total(self) -> 'CostMatrix':
+        """Return a copy with categories sorted by total cost across scenarios (descending)"""
+        order = np.argsort(-self.values.sum(axis=0), kind='stable')
+        return CostMatrix(self.scenarios, self.categories[order], self.values[:, order])
+
+    def select(self, categories: List[str]) -> np.ndarray:
+        """Return the columns for the given categories, with zeros for missing ones"""
+        column_index = {category: j for j, category in enumerate(self.categories)}
+        selected = np.zeros((len(self.scenarios), len(categories)), dtype=np.float64)
+        for j, category in enumerate(categories):
+            if category in column_index:
+                selected[:, j] = self.values[:, column_index[category]]
+        return selected
+
+@dataclass
+class ScenarioCosts:
+    """Columnar cost data of all compared scenarios, built once per chart run"""
+    names: np.ndarray
+    currency: str
+    annual_rates: np.ndarray
+    operating_costs: CostMatrix
+    material_costs: CostMatrix
+    consumable_costs: CostMatrix
+    utility_costs: CostMatrix
+
+    @classmethod
+    def from_processes(cls, processes: List[ProcessData]) -> 'ScenarioCosts':
+        names = [p.name for p in processes]
+        return cls(
+            names=np.array(names, dtype=object),
+            currency=processes[0].currency if processes else '€',
+            annual_rates=np.array([p.annual_rate for p in processes], dtype=np.float64),
+            operating_costs=CostMatrix.from_dicts(names, [p.operating_costs for p in processes]),
+            material_costs=CostMatrix.from_dicts(names, [p.material_costs for p in processes]),
+            consumable_costs=CostMatrix.from_dicts(names, [p.consumable_costs for p in processes]),
+            utility_costs=CostMatrix.from_dicts(names, [p.utility_costs for p in processes])
+        )
+
+    def unit_costs(self, costs: np.ndarray) -> np.ndarray:
+        """Divide per-scenario costs by the annual rate (0 where the rate is 0)"""
+        rates = self.annual_rates.reshape(-1, *([1] * (costs.ndim - 1)))
+        return np.divide(costs, rates, out=np.zeros_like(costs, dtype=np.float64), where=rates != 0)
+
+class SuperProTable:
+    """Indexed view of a SuperPro Designer report sheet.
+    
+    Built once per sheet so that extractors can look up cells by position instead
+    of rescanning the full cell list:
+    - values: (row, column) -> value
+    - column_rows: column -> sorted list of rows with a value in that column
+    """
+
+    def __init__(self, sheet: Dict):
+        self.max_row = sheet['max_row']
+        self.values: Dict[Tuple[int, int], Any] = {}
+        self.column_rows: Dict[int, List[int]] = {}
+        
+        for cell in sheet['cells']:
+            self.values[(cell['row'], cell['column'])] = cell['value']
+            self.column_rows.setdefault(cell['column'], []).append(cell['row'])
+        
+        for rows in self.column_rows.values():
+            rows.sort()
+
+    def get(self, row: int, column: int, default: Any = None) -> Any:
+        """Return the value at (row, column)"""
+        return self.values.get((row, column), default)
+
+    def rows(self, column: int, after: int = 0, before: Optional[int] = None) -> List[int]:
+        """Rows with a value in the given column, with after < row < before"""
+        rows = self.column_rows.get(column, [])
+        start = bisect_right(rows, after)
+        end = bisect_right(rows, before - 1) if before else len(rows)
+        return rows[start:end]
+
+    def find_row(self, column: int, text: str, after: int = 0) -> Optional[int]:
+        """First row after the given row whose value in column contains text"""
+        for row in self.rows(column, after=after):
+            if text in str(self.get(row, column)):
+                return row
+        return None
+
+    def iter_values(self):
+        """Iterate over all values in row-major order"""
+        return (self.values[key] for key in sorted(self.values))
+
 class ProcessDataExtractor:
     """Class to handle extraction of process data from SuperPro Designer JSON output"""
 
@@ -44,14 +169,29 @@ class ProcessDataExtractor:
         """Rename items according to standardized naming"""
         return self.name_mapping.get(name, name)
     
-    def __init__(self, file_path: str, scenario_name: Optional[str] = None):
-        self.data = self._load_json_data(file_path)
+    def __init__(self, file_path: str, scenario_name: Optional[str] = None, data: Optional[Dict] = None):
+        """
+        Args:
+            file_path: Path to the JSON output of excel_to_json (with data given, only used
+                as the fallback process name)
+            scenario_name: Optional scenario name to use instead of the filename
+            data: Optional cell structure from read_excel_for_llm, to skip loading JSON from disk
+        """
+        self.data = self._validate_data(data, file_path) if data is not None else self._load_json_data(file_path)
+        self.table = SuperProTable(self.data['Table p. 1'])
         self.currency = self._detect_currency()
         self.year = self._detect_year()
         self.number_format = self._detect_number_format()
         self.file_path = file_path
         self.scenario_name = scenario_name
         
+    @staticmethod
+    def _validate_data(data: Dict, file_path: str) -> Dict:
+        """Validate the cell structure of a SuperPro Designer output"""
+        if 'Table p. 1' not in data:
+            raise Exception(f"Error loading {file_path}: Invalid SuperPro Designer output format")
+        return data
+
     @staticmethod
     def _load_json_data(file_path: str) -> Dict:
         """Load and validate JSON data"""
@@ -66,34 +206,30 @@ class ProcessDataExtractor:
 
     def _detect_currency(self) -> str:
         """Detect currency symbol from the data"""
-        cells = self.data['Table p. 1']['cells']
-        for cell in cells:
-            if cell['row'] == 1 and cell['column'] == 3:
-                currency = cell['value'].strip()
-                # Handle euro symbol specifically
-                if 'EUR' in currency or '€' in currency:
-                    return '€'
-                return currency.replace(' ', '')
+        value = self.table.get(1, 3)
+        if value is not None:
+            currency = value.strip()
+            # Handle euro symbol specifically
+            if 'EUR' in currency or '€' in currency:
+                return '€'
+            return currency.replace(' ', '')
         return '$'  # Default to USD if not found
 
     def _detect_year(self) -> int:
         """Detect base year from the data"""
-        cells = self.data['Table p. 1']['cells']
         year_pattern = r'.*?(\d{4}).*?prices'
-        for cell in cells:
-            if cell['column'] == 1:
-                match = re.search(year_pattern, str(cell['value']))
-                if match:
-                    return int(match.group(1))
+        for row in self.table.rows(1):
+            match = re.search(year_pattern, str(self.table.get(row, 1)))
+            if match:
+                return int(match.group(1))
         return 2024  # Default to current year if not found
 
     def _detect_number_format(self) -> str:
         """Detect number formatting style: 'EU' for European format and 'US' for American format.
         Heuristic: if a value contains both '.' and ',', and the dot appears before the comma, assume European.
         """
-        cells = self.data['Table p. 1']['cells']
-        for cell in cells:
-            value_str = str(cell.get('value', '')).strip()
+        for value in self.table.iter_values():
+            value_str = str(value).strip()
             if '.' in value_str and ',' in value_str:
                 if value_str.find('.') < value_str.find(','):
                     return 'EU'
@@ -101,86 +237,51 @@ class ProcessDataExtractor:
                     return 'US'
         return 'US'
 
-    def _find_section_bounds(self, section_name: str) -> Tuple[int, int]:
-        """Find the start and end rows for a given section"""
-        cells = self.data['Table p. 1']['cells']
-        start_row = None
-        end_row = None
-        
-        for cell in cells:
-            if cell['column'] == 1:
-                if section_name in str(cell['value']):
-                    start_row = cell['row']
-                elif start_row and not end_row:
-                    if cell['value'].startswith(str(int(section_name[0]) + 1)):
-                        end_row = cell['row']
-                        break
-        
-        return start_row, end_row or self.data['Table p. 1']['max_row']
-
     def _extract_costs(self, start_marker: str, end_marker: str = None, value_column: int = 5, exclude_patterns: List[str] = None) -> Dict[str, float]:
         costs = {}
-        cells = self.data['Table p. 1']['cells']
+        table = self.table
         
         # Find start row of the section header
-        start_row = None
-        for cell in cells:
-            if cell['column'] == 1 and start_marker in str(cell['value']):
-                start_row = cell['row']
-                break
-                
+        start_row = table.find_row(1, start_marker)
         if not start_row:
             return costs
 
         # Find the header row (contains column names)
-        header_row = None
-        for cell in cells:
-            if cell['row'] > start_row and cell['column'] == 1:
-                header_row = cell['row']
-                break
-
-        if not header_row:
+        header_rows = table.rows(1, after=start_row)
+        if not header_rows:
             return costs
+        header_row = header_rows[0]
 
         # Find end row
-        end_row = None
-        if end_marker:
-            for cell in cells:
-                if cell['row'] > header_row and cell['column'] == 1 and end_marker in str(cell['value']):
-                    end_row = cell['row']
-                    break
+        end_row = table.find_row(1, end_marker, after=header_row) if end_marker else None
 
         # Process rows between header and end
-        for cell in cells:
-            if (cell['row'] > header_row and 
-                cell['column'] == 1 and 
-                (not end_row or cell['row'] < end_row)):
-                
-                name = cell['value'].strip() if cell.get('value') else ''
-                
-                # Skip if name matches any exclude pattern or is a header/total
-                if (not name or 
-                    name == 'TOTAL' or 
-                    (exclude_patterns and any(pattern in name for pattern in exclude_patterns))):
+        for row in table.rows(1, after=header_row, before=end_row):
+            value = table.get(row, 1)
+            name = value.strip() if value else ''
+            
+            # Skip if name matches any exclude pattern or is a header/total
+            if (not name or 
+                name == 'TOTAL' or 
+                (exclude_patterns and any(pattern in name for pattern in exclude_patterns))):
+                continue
+            
+            # Only process rows where column 1 contains the item name
+            cost_value = table.get(row, value_column)
+            
+            if cost_value is not None:
+                try:
+                    if self.number_format == 'EU':
+                        cost_str = str(cost_value).replace('.', '').replace(',', '.')
+                    else:
+                        cost_str = str(cost_value).replace(',', '')
+                    cost_str = ''.join(c for c in cost_str if c.isdigit() or c in '.-')
+                    cost = float(cost_str)
+                    if cost > 0:
+                        name = self._rename_item(name)
+                        costs[name] = cost
+                except ValueError:
                     continue
-                
-                # Only process rows where column 1 contains the item name
-                cost_value = next((c['value'] for c in cells 
-                                if c['row'] == cell['row'] and c['column'] == value_column), None)
-                
-                if cost_value is not None:
-                    try:
-                        if self.number_format == 'EU':
-                            cost_str = str(cost_value).replace('.', '').replace(',', '.')
-                        else:
-                            cost_str = str(cost_value).replace(',', '')
-                        cost_str = ''.join(c for c in cost_str if c.isdigit() or c in '.-')
-                        cost = float(cost_str)
-                        if cost > 0:
-                            name = self._rename_item(name)
-                            costs[name] = cost
-                    except ValueError:
-                        continue
                             
         return costs
 
@@ -233,21 +334,20 @@ class ProcessDataExtractor:
 
     def _extract_annual_rate(self) -> float:
         """Extract cost basis annual rate"""
-        cells = self.data['Table p. 1']['cells']
-        for cell in cells:
-            if cell['row'] == 6 and cell['column'] == 2:
-                try:
-                    value_str = str(cell['value'])
-                    if self.number_format == 'EU':
-                        # For European format (1.200 means 1200)
-                        value_str = value_str.replace('.', '').replace(',', '.')
-                    else:
-                        # For US format
-                        value_str = value_str.replace(',', '')
-                    return float(value_str)
-                except ValueError:
-                    return 0.0
-        return 0.0
+        value = self.table.get(6, 2)
+        if value is None:
+            return 0.0
+        try:
+            value_str = str(value)
+            if self.number_format == 'EU':
+                # For European format (1.200 means 1200)
+                value_str = value_str.replace('.', '').replace(',', '.')
+            else:
+                # For US format
+                value_str = value_str.replace(',', '')
+            return float(value_str)
+        except ValueError:
+            return 0.0
 
 @dataclass
 class ChartConfig:
@@ -274,53 +374,124 @@ class ChartConfig:
     
     # Unit scale settings
     unit_scale: str = "€"  # Options: €, k€, t€, m€
+    
+    # Rendering: with more than one worker, charts are rendered in parallel worker processes
+    render_workers: int = 1
     scale_factors = {
         "€": 1,
         "k€": 1e-3,
         "m€": 1e-6
     }
 
+# Comparative charts: filename -> (title, ScenarioCosts attribute)
+COMPARATIVE_CHARTS = {
+    'AOC.png': ('Operating Costs', 'operating_costs'),
+    'Materials.png': ('Material Costs', 'material_costs'),
+    'Consumables.png': ('Consumable Costs', 'consumable_costs'),
+    'Utilities.png': ('Utility Costs', 'utility_costs')
+}
+STACKED_CHART = 'stacked_bar_chart.png'
+CHART_FILES = list(COMPARATIVE_CHARTS) + [STACKED_CHART]
+
+# ChartConfig fields read by each kind of chart
+FIGURE_CONFIG_FIELDS = {
+    'title_font_size', 'label_font_size', 'legend_font_size', 'tick_font_size',
+    'bar_width', 'figure_width', 'figure_height', 'dpi', 'show_title'
+}
+COMPARATIVE_CONFIG_FIELDS = FIGURE_CONFIG_FIELDS | {'unit_scale'}
+STACKED_CONFIG_FIELDS = FIGURE_CONFIG_FIELDS | {'value_font_size', 'title_prefix'}
+
+def charts_to_redraw(old_config: Optional[ChartConfig], new_config: ChartConfig) -> List[str]:
+    """Return the chart files affected by a config change (all charts if there is no previous config)"""
+    if old_config is None:
+        return list(CHART_FILES)
+    
+    changed = {f.name for f in fields(ChartConfig) if getattr(old_config, f.name) != getattr(new_config, f.name)}
+    charts = []
+    if changed & COMPARATIVE_CONFIG_FIELDS:
+        charts.extend(COMPARATIVE_CHARTS)
+    if changed & STACKED_CONFIG_FIELDS:
+        charts.append(STACKED_CHART)
+    return charts
+
+def chart_buffer_name(filename: str, image_format: str) -> str:
+    """Chart file name with the extension of image_format, e.g. 'AOC.svg' for 'AOC.png' rendered as SVG"""
+    return f"{os.path.splitext(filename)[0]}.{image_format}"
+
 class ChartGenerator:
     """Class to handle chart generation for multiple processes"""
     
-    def __init__(self, output_dir: str, config: Optional[ChartConfig] = None):
+    def __init__(self, output_dir: Optional[str], config: Optional[ChartConfig] = None, image_format: str = 'png'):
+        """
+        Args:
+            output_dir: Directory to save charts to, or None to keep them in memory
+                (each chart method then returns a BytesIO, also stored in self.buffers
+                under buffer_name(filename))
+            config: Chart styling configuration
+            image_format: Image format for in-memory charts ('png' or 'svg')
+        """
         self.output_dir = output_dir
         self.config = config or ChartConfig()
-        os.makedirs(output_dir, exist_ok=True)
-        plt.rcParams['font.family'] = 'DejaVu Sans'  # Use a font that supports the euro symbol
+        self.image_format = image_format
+        self.buffers: Dict[str, io.BytesIO] = {}
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        matplotlib.rcParams['font.family'] = 'DejaVu Sans'  # Use a font that supports the euro symbol
+
+    def buffer_name(self, filename: str) -> str:
+        """Name of an in-memory chart: the chart file name with the extension of image_format"""
+        return chart_buffer_name(filename, self.image_format)
+
+    def _save(self, fig: Figure, filename: str, **kwargs) -> Optional[io.BytesIO]:
+        """Save a figure to output_dir, or to an in-memory buffer when there is no output_dir"""
+        if self.output_dir is not None:
+            fig.savefig(os.path.join(self.output_dir, filename), **kwargs)
+            return None
+        
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=self.image_format, **kwargs)
+        buffer.seek(0)
+        self.buffers[self.buffer_name(filename)] = buffer
+        return buffer
         
     def create_comparative_chart(self, 
-                               data: Dict[str, Dict[str, float]], 
+                               data: Union[CostMatrix, Dict[str, Dict[str, float]]], 
                                title: str, 
                                ylabel: str,
                                filename: str):
         """Create comparative bar chart"""
-        if not data:
+        if isinstance(data, dict):
+            data = CostMatrix.from_dicts(list(data.keys()), list(data.values()))
+        if len(data.scenarios) == 0:
             return
 
-        processes = list(data.keys())
-        categories = list(set().union(*[d.keys() for d in data.values()]))
-        
+        fig = Figure(figsize=(self.config.figure_width, self.config.figure_height), dpi=self.config.dpi)
+        self._draw_comparative_chart(fig, data, title, ylabel)
+        fig.tight_layout()
+        return self._save(fig, filename)
+
+    def _draw_comparative_chart(self, fig: Union[Figure, SubFigure], data: CostMatrix, title: str, ylabel: str):
+        """Draw a comparative bar chart onto a figure or subfigure"""
         # Sort categories by total value while maintaining process order
-        category_totals = {cat: sum(data[proc].get(cat, 0) for proc in processes) for cat in categories}
-        categories = sorted(categories, key=lambda x: category_totals[x], reverse=True)
+        data = data.sorted_by_total()
+        processes = data.scenarios
+        categories = data.categories
         
         x = np.arange(len(categories))
-        width = 0.8 / len(processes)
 
-        fig, ax = plt.subplots(figsize=(self.config.figure_width, self.config.figure_height), dpi=self.config.dpi)
+        ax = fig.subplots()
         
         # Disable scientific notation
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: format(int(x), ',')))
         
         # Apply unit scale if not unit production chart
         scale_factor = self.config.scale_factors[self.config.unit_scale]
+        values = data.values * scale_factor
         
         # Plot bars in original process order to maintain consistency
         bar_width = self.config.bar_width / len(processes)
         for i, process in enumerate(processes):
-            values = [data[process].get(cat, 0) * scale_factor for cat in categories]
-            ax.bar(x + i*bar_width, values, bar_width, label=process)
+            ax.bar(x + i*bar_width, values[i], bar_width, label=process)
 
         # Update ylabel with unit scale, removing any existing currency symbol
         ylabel_base = ylabel.replace('(€)', '').strip()
@@ -334,13 +505,24 @@ class ChartGenerator:
         
         # Set y-axis tick label font size
         ax.tick_params(axis='y', labelsize=self.config.tick_font_size)
-        
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, filename))
-        plt.close()
 
-    def create_stacked_bar_chart(self, processes: List[ProcessData]):
+    def create_stacked_bar_chart(self, processes: Union[ScenarioCosts, List[ProcessData]]):
         """Create stacked bar chart for unit production costs"""
+        if not isinstance(processes, ScenarioCosts):
+            processes = ScenarioCosts.from_processes(processes)
+        
+        fig = Figure(figsize=(self.config.figure_width, self.config.figure_height), dpi=self.config.dpi)
+        self._draw_stacked_bar_chart(fig, processes)
+        
+        # Adjust layout
+        fig.subplots_adjust(left=0.1, right=0.85, bottom=0.15, top=0.9)
+        fig.tight_layout()
+        
+        # Save chart
+        return self._save(fig, STACKED_CHART, bbox_inches='tight')
+
+    def _draw_stacked_bar_chart(self, fig: Union[Figure, SubFigure], processes: ScenarioCosts):
+        """Draw the unit production cost stacked bar chart onto a figure or subfigure"""
         categories = [
             'Raw materials (OPEX)', 'Labor (OPEX)', 'Utilities (OPEX)',
             'Consumables (OPEX)', 'Wastewater treatment (OPEX)', 
@@ -348,44 +530,42 @@ class ChartGenerator:
         ]
         colors = ['skyblue', 'orange', 'navy', 'green', 'red', 'purple', 'gray']
         
-        fig, ax = plt.subplots(figsize=(self.config.figure_width, self.config.figure_height), dpi=self.config.dpi)
-        x = np.arange(len(processes))
+        n_processes = len(processes.names)
+        ax = fig.subplots()
+        x = np.arange(n_processes)
         width = self.config.bar_width
-        bottom = np.zeros(len(processes))
-        
-        for cat, color in zip(categories, colors):
-            values = []
-            for process in processes:
-                cat_cost = process.operating_costs.get(cat, 0)
-                annual_rate = process.annual_rate
-                unit_cost = cat_cost / annual_rate if annual_rate else 0
-                values.append(unit_cost)
-            
-            ax.bar(x, values, width, label=cat, bottom=bottom, 
+        
+        # Unit costs (scenarios × categories) and the stacking offsets of each segment
+        unit_costs = processes.unit_costs(processes.operating_costs.select(categories))
+        bottoms = np.cumsum(unit_costs, axis=1) - unit_costs
+        
+        for j, (cat, color) in enumerate(zip(categories, colors)):
+            values = unit_costs[:, j]
+            ax.bar(x, values, width, label=cat, bottom=bottoms[:, j], 
                 color=color, edgecolor='white', linewidth=0.5)
-            
-            # Add value labels for significant contributions
-            for i, v in enumerate(values):
-                if v >= 300:  # Only show labels for categories >= 300
-                    ax.text(i, bottom[i] + v/2, f'{v:.0f}', 
-                        ha='center', va='center',
-                        fontweight='bold', color='white', fontsize=self.config.value_font_size)
-            
-            bottom += values
+        
+        # Add value labels for significant contributions (>= 300)
+        label_rows, label_cols = np.nonzero(unit_costs >= 300)
+        label_y = bottoms[label_rows, label_cols] + unit_costs[label_rows, label_cols] / 2
+        for i, y, v in zip(label_rows, label_y, unit_costs[label_rows, label_cols]):
+            ax.text(i, y, f'{v:.0f}', 
+                ha='center', va='center',
+                fontweight='bold', color='white', fontsize=self.config.value_font_size)
         
         # Add total cost labels
-        for i, process in enumerate(processes):
-            total_cost = sum(process.operating_costs.values()) / process.annual_rate if process.annual_rate else 0
-            ax.text(i, bottom[i], f'Total: {total_cost:.0f}',
+        tops = unit_costs.sum(axis=1)
+        totals = processes.unit_costs(processes.operating_costs.values.sum(axis=1))
+        for i, (top, total_cost) in enumerate(zip(tops, totals)):
+            ax.text(i, top, f'Total: {total_cost:.0f}',
                     ha='center', va='bottom',
                     fontsize=self.config.value_font_size, fontweight='bold', color='black')
         
         # Customize appearance
-        ax.set_ylabel(f'Unit Production Cost [{processes[0].currency} kg⁻¹]', fontsize=self.config.label_font_size)
+        ax.set_ylabel(f'Unit Production Cost [{processes.currency} kg⁻¹]', fontsize=self.config.label_font_size)
         if self.config.show_title:
             ax.set_title(f'{self.config.title_prefix} Unit Production Cost', fontsize=self.config.title_font_size, fontweight='bold')
         ax.set_xticks(x)
-        ax.set_xticklabels([p.name for p in processes], fontsize=self.config.tick_font_size, rotation=45, ha='right')
+        ax.set_xticklabels(processes.names, fontsize=self.config.tick_font_size, rotation=45, ha='right')
         ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=self.config.legend_font_size)
         
         # Set y-axis tick label font size
@@ -395,24 +575,23 @@ class ChartGenerator:
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
         
-        # Adjust layout
-        ax.set_xlim(-0.5, len(processes) - 0.5)
-        plt.subplots_adjust(left=0.1, right=0.85, bottom=0.15, top=0.9)
-        plt.tight_layout()
-        
-        # Save chart
-        plt.savefig(os.path.join(self.output_dir, 'stacked_bar_chart.png'), 
-                    bbox_inches='tight')
-        plt.close()
+        ax.set_xlim(-0.5, n_processes - 0.5)
 
-    def create_multi_panel_figure(self, selected_charts: List[Tuple[str, str]], output_filename: str, n_rows: int = None, n_cols: int = None):
+    def create_multi_panel_figure(self, selected_charts: List[Tuple[Union[str, bytes, io.BytesIO], str]], output_filename: str, n_rows: int = None, n_cols: int = None,
+                                  costs: Optional[ScenarioCosts] = None):
         """Create a multi-panel figure from selected charts with labels.
         
+        With costs given and charts selected by name (e.g. 'AOC.png'), the panels are drawn
+        directly from the extracted data as vector subfigures. Otherwise the rendered PNGs are
+        tiled into a single image array at their native resolution, without re-plotting them.
+        
         Args:
-            selected_charts: List of tuples (chart_path, label) for each selected chart
+            selected_charts: List of tuples (chart, label) for each selected chart, where chart
+                is a chart name, a PNG file path, PNG bytes or an in-memory buffer returned by this class
             output_filename: Name of the output file for the combined figure
             n_rows: Number of rows in the grid layout (optional)
             n_cols: Number of columns in the grid layout (optional)
+            costs: Extracted cost data to draw the panels from (optional)
         """
         n_charts = len(selected_charts)
         if n_charts == 0:
@@ -427,33 +606,290 @@ class ChartGenerator:
                 n_rows = (n_charts + 1) // 2  # Round up division
                 n_cols = 2
         
-        # Create figure with subplots
-        fig = plt.figure(figsize=(self.config.figure_width * n_cols, 
-                                self.config.figure_height * n_rows))
+        if costs is not None and all(chart in CHART_FILES for chart, _ in selected_charts):
+            return self._compose_subfigures(selected_charts, output_filename, n_rows, n_cols, costs)
+        return self._tile_images(selected_charts, output_filename, n_rows, n_cols)
+
+    def _compose_subfigures(self, selected_charts: List[Tuple[str, str]], output_filename: str,
+                            n_rows: int, n_cols: int, costs: ScenarioCosts) -> Optional[io.BytesIO]:
+        """Draw each selected chart from the cost data into its own subfigure of one figure"""
+        fig = Figure(figsize=(self.config.figure_width * n_cols, self.config.figure_height * n_rows),
+                     dpi=self.config.dpi, layout='constrained')
+        subfigs = fig.subfigures(n_rows, n_cols, squeeze=False).ravel()
+        
+        for subfig, (chart, label) in zip(subfigs, selected_charts):
+            if chart == STACKED_CHART:
+                self._draw_stacked_bar_chart(subfig, costs)
+            else:
+                title, attribute = COMPARATIVE_CHARTS[chart]
+                self._draw_comparative_chart(subfig, getattr(costs, attribute), f'Comparative {title}', 'Annual Cost')
+            
+            # Add label in top-left corner
+            subfig.text(0.02, 0.98, label, ha='left', va='top',
+                        fontsize=self.config.label_font_size, fontweight='bold',
+                        bbox=dict(facecolor='white', edgecolor='none', alpha=0.8))
+        
+        return self._save(fig, output_filename, bbox_inches='tight')
+
+    def _tile_images(self, selected_charts: List[Tuple[Union[str, bytes, io.BytesIO], str]], output_filename: str,
+                     n_rows: int, n_cols: int) -> Optional[io.BytesIO]:
+        """Tile rendered chart images into one RGB array, one grid cell per chart"""
+        images = []
+        for chart, label in selected_charts:
+            if isinstance(chart, str) and not os.path.exists(chart):
+                images.append(None)
+                continue
+            if isinstance(chart, (bytes, bytearray)):
+                chart = io.BytesIO(chart)
+            elif hasattr(chart, 'seek'):
+                chart.seek(0)
+            images.append(Image.open(chart))  # Lazy: only the header is read here
+        
+        # Every cell is as large as the largest chart; charts are centered in their cell
+        sizes = [image.size for image in images if image is not None]
+        if not sizes:
+            return None
+        cell_width = max(width for width, _ in sizes)
+        cell_height = max(height for _, height in sizes)
+        grid = np.full((cell_height * n_rows, cell_width * n_cols, 3), 255, dtype=np.uint8)
+        
+        font_size = max(1, round(self.config.label_font_size * self.config.dpi / 72))
+        font = ImageFont.truetype(font_manager.findfont(FontProperties(family='DejaVu Sans', weight='bold')), font_size)
         
-        # Add each chart to the grid
-        for idx, (chart_path, label) in enumerate(selected_charts):
-            if not os.path.exists(chart_path):
+        for idx, (image, (_, label)) in enumerate(zip(images, selected_charts)):
+            if image is None:
                 continue
-                
-            # Create subplot
-            ax = fig.add_subplot(n_rows, n_cols, idx + 1)
             
-            # Load and display chart image
-            img = plt.imread(chart_path)
-            ax.imshow(img)
-            ax.axis('off')
+            # Decode one chart at a time, flattening transparency onto white
+            panel = Image.new('RGB', image.size, 'white')
+            panel.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
             
             # Add label in top-left corner
-            ax.text(0.02, 0.98, label, transform=ax.transAxes,
-                   fontsize=self.config.label_font_size, fontweight='bold',
-                   bbox=dict(facecolor='white', edgecolor='none', alpha=0.8))
+            draw = ImageDraw.Draw(panel)
+            x, y = round(0.02 * image.width), round(0.02 * image.height)
+            left, top, right, bottom = draw.textbbox((x, y), label, font=font)
+            pad = font_size // 4
+            draw.rectangle((left - pad, top - pad, right + pad, bottom + pad), fill='white')
+            draw.text((x, y), label, font=font, fill='black')
+            
+            row, col = divmod(idx, n_cols)
+            top = row * cell_height + (cell_height - image.height) // 2
+            left = col * cell_width + (cell_width - image.width) // 2
+            grid[top:top + image.height, left:left + image.width] = np.asarray(panel)
+        
+        output = Image.fromarray(grid)
+        if self.output_dir is not None:
+            output.save(os.path.join(self.output_dir, output_filename), format='PNG', dpi=(self.config.dpi, self.config.dpi))
+            return None
         
-        # Adjust layout and save
-        plt.tight_layout()
-        output_path = os.path.join(self.output_dir, output_filename)
-        plt.savefig(output_path, dpi=self.config.dpi, bbox_inches='tight')
-        plt.close()
+        buffer = io.BytesIO()
+        output.save(buffer, format='PNG', dpi=(self.config.dpi, self.config.dpi))
+        buffer.seek(0)
+        self.buffers[output_filename] = buffer
+        return buffer
+
+# Worker processes shared by all callers and Streamlit sessions, which caps the total;
+# one per chart at most, as rendering is the widest parallel job
+MAX_POOL_WORKERS = min(5, os.cpu_count() or 1)
+_pool_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+def shared_process_pool() -> ProcessPoolExecutor:
+    """Process pool reused across calls; its workers are started once, on first use.
+    
+    Workers are spawned rather than forked: forking the multi-threaded Streamlit server
+    can deadlock the children on locks held by other threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _replace_broken_pool(pool: ProcessPoolExecutor):
+    """Drop a pool whose worker died (e.g. killed for memory); it rejects all further work"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _submit(function, job: tuple) -> Future:
+    """Submit function(*job) to the shared pool, replacing the pool once if it is broken"""
+    for _ in range(2):
+        pool = shared_process_pool()
+        try:
+            return pool.submit(function, *job)
+        except BrokenProcessPool as e:
+            _replace_broken_pool(pool)
+            error = e
+    future = Future()
+    future.set_exception(error)
+    return future
+
+def _run_in_pool(function, jobs: List[tuple], limit: int) -> List[Future]:
+    """Run function(*job) for each job in the shared pool, at most limit at a time.
+    
+    Returns the finished futures in the order of jobs. Jobs running when a worker dies
+    fail with BrokenProcessPool; the jobs after them go to a new pool.
+    """
+    futures, pending = [], set()
+    for job in jobs:
+        if len(pending) >= limit:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+        future = _submit(function, job)
+        futures.append(future)
+        pending.add(future)
+    wait(pending)
+    return futures
+
+def _extract_scenario(source: Union[str, bytes], scenario_name: Optional[str] = None,
+                      file_name: Optional[str] = None, write_json: bool = False) -> ProcessData:
+    """Parse one EER file and extract its process data.
+    
+    Excel files are read straight into memory; the intermediate JSON is only written
+    (next to the input file) when write_json is set. JSON files from excel_to_json are
+    loaded as they are.
+    """
+    if isinstance(source, str):
+        file_name = file_name or source
+        if source.lower().endswith('.json'):
+            return ProcessDataExtractor(source, scenario_name).extract_process_data()
+        if write_json:
+            return ProcessDataExtractor(excel_to_json(source), scenario_name).extract_process_data()
+    
+    data = read_excel_for_llm(source, file_name=file_name)
+    if data is None:
+        raise Exception("Failed to read Excel file")
+    return ProcessDataExtractor(file_name, scenario_name, data=data).extract_process_data()
+
+def extract_processes(sources: List[Union[str, bytes]], scenario_names: Optional[List[Optional[str]]] = None,
+                      file_names: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                      write_json: bool = False) -> List[Union[ProcessData, Exception]]:
+    """Parse and extract several EER files concurrently in the shared process pool.
+    
+    Excel parsing is CPU-bound and holds the GIL, so each file is handled in a worker
+    process. Results are returned in the order of sources; a file that fails
+    yields its exception instead of a ProcessData, without affecting the others.
+    
+    Args:
+        sources: EER files as paths (.xls/.xlsx, or JSON produced by excel_to_json)
+            or as in-memory file content (bytes)
+        scenario_names: Optional scenario name per file (None falls back to the filename)
+        file_names: File names for in-memory sources, used to detect the Excel format
+        max_workers: Number of files extracted at once (defaults to one per file, up to
+            MAX_POOL_WORKERS); 1 extracts them in the calling process
+        write_json: Also write the intermediate JSON next to each Excel path
+    """
+    scenario_names = list(scenario_names or [])
+    scenario_names += [None] * (len(sources) - len(scenario_names))
+    file_names = list(file_names or [])
+    file_names += [None] * (len(sources) - len(file_names))
+    jobs = [(source, scenario_name, file_name, write_json)
+            for source, scenario_name, file_name in zip(sources, scenario_names, file_names)]
+    
+    if max_workers is None:
+        max_workers = min(len(jobs), MAX_POOL_WORKERS)
+    
+    results = []
+    if max_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                results.append(_extract_scenario(*job))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    for future in _run_in_pool(_extract_scenario, jobs, max_workers):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+def _render_chart(output_dir: Optional[str], config: ChartConfig, costs: ScenarioCosts, filename: str,
+                  image_format: str = 'png') -> Optional[bytes]:
+    """Render a single chart (worker process entry point); returns its bytes when rendering in memory"""
+    chart_gen = ChartGenerator(output_dir, config=replace(config, render_workers=1), image_format=image_format)
+    render_charts(chart_gen, costs, [filename])
+    buffer = chart_gen.buffers.get(chart_gen.buffer_name(filename))
+    return buffer.getvalue() if buffer is not None else None
+
+def render_charts(chart_gen: ChartGenerator, costs: ScenarioCosts, charts: Optional[List[str]] = None):
+    """Render the given chart files (all by default) from already extracted cost data.
+    
+    With config.render_workers > 1 the charts are rendered in the shared process pool,
+    up to render_workers (and MAX_POOL_WORKERS) at a time; figures only use the
+    object-oriented Figure API, so no pyplot state is shared. In-memory charts rendered
+    by workers are collected into chart_gen.buffers, named by chart_gen.buffer_name.
+    """
+    charts = CHART_FILES if charts is None else charts
+    
+    workers = min(chart_gen.config.render_workers, len(charts), MAX_POOL_WORKERS)
+    if workers > 1:
+        jobs = [(chart_gen.output_dir, chart_gen.config, costs, filename, chart_gen.image_format)
+                for filename in charts]
+        for filename, future in zip(charts, _run_in_pool(_render_chart, jobs, workers)):
+            chart_bytes = future.result()
+            if chart_bytes is not None:
+                chart_gen.buffers[chart_gen.buffer_name(filename)] = io.BytesIO(chart_bytes)
+        return
+    
+    # Generate individual comparative charts
+    for filename, (title, attribute) in COMPARATIVE_CHARTS.items():
+        if filename in charts:
+            chart_gen.create_comparative_chart(
+                getattr(costs, attribute),
+                f'Comparative {title}',
+                'Annual Cost',
+                filename
+            )
+    
+    # Generate stacked bar chart
+    if STACKED_CHART in charts:
+        chart_gen.create_stacked_bar_chart(costs)
+
+def create_charts(processes: List[ProcessData], output_dir: str, config: Optional[ChartConfig] = None):
+    """Generate all comparative charts and the stacked bar chart for the given processes"""
+    # Build the columnar cost data once for all charts
+    costs = ScenarioCosts.from_processes(processes)
+
+    # Generate charts with custom settings
+    chart_gen = ChartGenerator(output_dir, config=config)
+    render_charts(chart_gen, costs)
+
+class ChartRenderer:
+    """Keeps extracted process data in memory and re-renders only the charts affected by config changes"""
+
+    def __init__(self, processes: List[ProcessData], image_format: str = 'png'):
+        self.costs = ScenarioCosts.from_processes(processes)
+        self.image_format = image_format
+        self.config: Optional[ChartConfig] = None  # Snapshot of the config of the last render
+        self.images: Dict[str, bytes] = {}  # Chart file -> rendered image bytes
+
+    @property
+    def charts(self) -> Dict[str, bytes]:
+        """Rendered image bytes in display order, keyed by file name with the image format's extension
+        (e.g. 'AOC.svg' for the AOC.png chart rendered as SVG)"""
+        return {chart_buffer_name(filename, self.image_format): self.images[filename]
+                for filename in CHART_FILES if filename in self.images}
+
+    def render(self, config: ChartConfig) -> List[str]:
+        """Render the charts affected since the last render and return their filenames"""
+        charts = charts_to_redraw(self.config, config)
+        if charts:
+            chart_gen = ChartGenerator(None, config=config, image_format=self.image_format)
+            render_charts(chart_gen, self.costs, charts)
+            for filename in charts:
+                buffer = chart_gen.buffers.get(chart_gen.buffer_name(filename))
+                if buffer is not None:
+                    self.images[filename] = buffer.getvalue()
+                else:
+                    self.images.pop(filename, None)
+        
+        # The config object is edited in place by the settings widgets, so keep a copy
+        self.config = replace(config)
+        return charts
 
 def main(json_files: List[str], scenario_names: List[str], output_dir: str, config: Optional[ChartConfig] = None):
     """Main function to process multiple JSON files and generate charts"""
@@ -461,39 +897,16 @@ def main(json_files: List[str], scenario_names: List[str], output_dir: str, conf
     processes = []
     
     # Extract data from all process files
-    for file_path, scenario_name in zip(json_files, scenario_names):
-        try:
-            extractor = ProcessDataExtractor(file_path, scenario_name)
-            process_data = extractor.extract_process_data()
-            processes.append(process_data)
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    jobs = list(zip(json_files, scenario_names))
+    results = extract_processes([f for f, _ in jobs], [n for _, n in jobs])
+    for (file_path, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"Error processing {file_path}: {str(result)}")
             continue
+        processes.append(result)
 
     if not processes:
         print("No valid process data found")
         return
 
-    # Generate charts with custom settings
-    chart_gen = ChartGenerator(output_dir, config=config)
-    
-    # Create comparative charts for each cost category
-    categories = {
-        'Operating Costs': (lambda p: p.operating_costs, 'AOC.png'),
-        'Material Costs': (lambda p: p.material_costs, 'Materials.png'),
-        'Consumable Costs': (lambda p: p.consumable_costs, 'Consumables.png'),
-        'Utility Costs': (lambda p: p.utility_costs, 'Utilities.png')
-    }
-    
-    # Generate individual comparative charts
-    for title, (getter, filename) in categories.items():
-        data = {p.name: getter(p) for p in processes}
-        chart_gen.create_comparative_chart(
-            data,
-            f'Comparative {title}',
-            'Annual Cost',
-            filename
-        )
-    
-    # Generate stacked bar chart
-    chart_gen.create_stacked_bar_chart(processes)
+    create_charts(processes, output_dir, config=config)
@@ -1,15 +1,103 @@
 import pandas as pd
+import numpy as np
+import io
 import json
 import sys
 import os
 from openpyxl import load_workbook
 
-def read_excel_for_llm(file_path):
-    print(f"Attempting to read file: {file_path}")
+# Column letters used for the "column_letter" field (A, B, C, ... wrapping after Z)
+COLUMN_LETTERS = np.array([chr(65 + i) for i in range(26)], dtype=object)
+
+def _cell_to_str(value):
+    """Convert a cell value to string with error handling"""
+    try:
+        return str(value)
+    except UnicodeEncodeError:
+        return str(value).encode('ascii', 'replace').decode('ascii')
+
+def dataframe_to_cells(df):
+    """Convert the non-empty cells of a DataFrame to the cell list used in the JSON output.
+    
+    The non-null mask and the cell coordinates are computed in bulk, so only the
+    non-empty cells are visited from Python. Cells are returned in row-major order.
+    """
+    rows, cols = np.nonzero(df.notna().to_numpy())
+    if rows.size == 0:
+        return []
+    
+    values = df.to_numpy(dtype=object)[rows, cols]
+    letters = COLUMN_LETTERS[cols % 26]
+    
+    # Adding 1 to match Excel's 1-based indexing
+    return [
+        {
+            "row": row,
+            "column": col,
+            "column_letter": letter,
+            "value": _cell_to_str(value)
+        }
+        for row, col, letter, value in zip((rows + 1).tolist(), (cols + 1).tolist(), letters, values)
+    ]
+
+def dataframe_to_text(df):
+    """Convert DataFrame to plain text, excluding empty cells.
+    
+    The header comes first, then one tab-separated line per row with its non-blank
+    cells; rows without any are left out. The non-blank mask is built once for the
+    whole table and the text is joined in a single pass, without iterating rows.
+    """
+    # Drop completely empty rows and columns
+    df = df.dropna(how='all').dropna(axis=1, how='all')
+    
+    # Convert to string and replace NaN with empty string
+    text_table = df.fillna('').astype(str)
+    header = '\t'.join(str(col) for col in text_table.columns)
+    
+    cells = pd.Series(text_table.to_numpy(dtype=object).ravel(), dtype=object)
+    # astype(str) can leave missing values (e.g. NaT) that the text shows as str(value)
+    missing = cells.isna().to_numpy()
+    if missing.any():
+        cells[missing] = [str(value) for value in cells[missing]]
+    non_blank = cells.str.strip().ne('').to_numpy(dtype=bool)
+    if not non_blank.any():
+        return header
+    
+    # Row of every kept cell (row-major order), and the separator placed before it
+    rows = np.repeat(np.arange(text_table.shape[0]), text_table.shape[1])[non_blank]
+    parts = np.empty(2 * rows.size, dtype=object)
+    parts[0] = '\n'
+    parts[2::2] = np.where(rows[1:] == rows[:-1], '\t', '\n')
+    parts[1::2] = cells.to_numpy()[non_blank]
+    return header + ''.join(parts)
+
+def _excel_source(file):
+    """Return a function giving a fresh readable source for each Excel reader call.
+    
+    Paths are passed through unchanged; bytes and file-like objects are read once
+    and re-wrapped in a BytesIO so the workbook can be opened several times.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        return lambda: file
+    data = file if isinstance(file, (bytes, bytearray)) else file.read()
+    return lambda: io.BytesIO(data)
+
+def read_excel_for_llm(file_path, file_name=None):
+    """Read all sheets of an Excel file into the cell structure used by the charts and the LLM.
+    
+    Args:
+        file_path: Path to the file, or its content as bytes or a file-like object
+        file_name: Name used to detect the format when file_path is not a path
+            (defaults to the file-like object's name attribute)
+    """
+    if file_name is None:
+        file_name = file_path if isinstance(file_path, (str, os.PathLike)) else getattr(file_path, 'name', '')
+    print(f"Attempting to read file: {file_name}")
     
     try:
         # Determine file extension
-        _, ext = os.path.splitext(file_path)
+        _, ext = os.path.splitext(file_name)
+        source = _excel_source(file_path)
         
         if ext.lower() in ['.xlsx', '.xls']:
             sheets = {}
@@ -18,14 +106,14 @@ def read_excel_for_llm(file_path):
                 print("Detected .xls format, attempting to read with xlrd engine")
                 try:
                     # For .xls files, try xlrd first
-                    sheets = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
+                    sheets = pd.read_excel(source(), sheet_name=None, engine='xlrd')
                     print("Successfully read .xls file with xlrd engine")
                 except Exception as e:
                     print(f"xlrd engine failed: {str(e)}")
                     try:
                         # Fallback to openpyxl
                         print("Attempting fallback to openpyxl engine")
-                        sheets = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
+                        sheets = pd.read_excel(source(), sheet_name=None, engine='openpyxl')
                         print("Successfully read file with openpyxl engine")
                     except Exception as e2:
                         print(f"openpyxl engine also failed: {str(e2)}")
@@ -34,20 +122,20 @@ def read_excel_for_llm(file_path):
                 print("Detected .xlsx format, attempting to read with openpyxl engine")
                 try:
                     # Use openpyxl for .xlsx files
-                    xlsx = load_workbook(filename=file_path, read_only=True, data_only=True)
+                    xlsx = load_workbook(filename=source(), read_only=True, data_only=True)
                     for sheet_name in xlsx.sheetnames:
                         try:
-                            df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+                            df = pd.read_excel(source(), sheet_name=sheet_name, engine='openpyxl')
                             sheets[sheet_name] = df
                         except UnicodeDecodeError:
-                            df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl', encoding='latin1')
+                            df = pd.read_excel(source(), sheet_name=sheet_name, engine='openpyxl', encoding='latin1')
                             sheets[sheet_name] = df
                     print("Successfully read .xlsx file")
                 except Exception as e:
                     print(f"Failed to read .xlsx file: {str(e)}")
                     raise
             
-            print(f"Successfully read the Excel file: {file_path}")
+            print(f"Successfully read the Excel file: {file_name}")
             
             file_data = {}
             
@@ -62,24 +150,7 @@ def read_excel_for_llm(file_path):
                     "cells": []
                 }
                 
-                # Iterate through the dataframe
-                for row in range(df.shape[0]):
-                    for col in range(df.shape[1]):
-                        value = df.iat[row, col]
-                        if pd.notna(value):  # Check if the cell is not empty
-                            # Convert value to string with error handling
-                            try:
-                                str_value = str(value)
-                            except UnicodeEncodeError:
-                                str_value = str(value).encode('ascii', 'replace').decode('ascii')
-                            
-                            cell_data = {
-                                "row": row + 1,  # Adding 1 to match Excel's 1-based indexing
-                                "column": col + 1,
-                                "column_letter": chr(65 + col % 26),  # Convert column number to letter (A, B, C, etc.)
-                                "value": str_value
-                            }
-                            data["cells"].append(cell_data)
+                data["cells"] = dataframe_to_cells(df)
                 
                 file_data[sheet_name] = data
                 print(f"Processed {len(data['cells'])} non-empty cells in sheet {sheet_name}")
@@ -90,7 +161,7 @@ def read_excel_for_llm(file_path):
             return None
     
     except Exception as e:
-        print(f"Error reading Excel file {file_path}: {str(e)}")
+        print(f"Error reading Excel file {file_name}: {str(e)}")
         raise  # Re-raise the exception to ensure proper error handling
 
 def excel_to_json(input_file):
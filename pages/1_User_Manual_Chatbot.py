@@ -1,9 +1,13 @@
 import streamlit as st
-import os
-import openai
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Callable, Optional, Union
 from r2r import R2RClient
 from utils.check_auth import check_auth
+from utils.chat_memory import SUMMARY_TOKEN_BUDGET, ChatMemory
+from utils.http_clients import get_openai_client, get_r2r_client
+from utils.llm_cache import make_key, response_cache
+from utils.context_packing import PackedContext, pack_context
+from utils.manual_index import ManualIndex, load_manual_index
+from utils.retrieval_cache import normalize_query, retrieval_cache
 
 # Page config
 st.set_page_config(page_title="User Manual Chatbot", page_icon="📚")
@@ -22,7 +26,7 @@ with st.expander("Instructions", expanded=False):
     - Understand best practices and recommended workflows
     - Troubleshoot common issues and challenges
 
-    Simply type your question below - for example:
+    Ask your question in the chat box below and follow up on the answers - for example:
     - "How do I set up a batch process simulation?"
     - "What's the difference between procedure and operation modes?"
     - "How can I optimize my equipment sizing?"
@@ -50,102 +54,220 @@ Context: {context}
 
 Response:"""
 
+# Part of the response cache key; bump when answers to the same question should no longer be reused
+CHATBOT_TEMPLATE_VERSION = "4"
+CHATBOT_MODEL = "google/gemini-2.0-flash-001"
+SEARCH_LIMIT = 30
+# Retrieved chunks are deduplicated, reranked and packed into this many context tokens
+CONTEXT_TOKEN_BUDGET = 4000
+
+# Older chat turns are folded into a rolling summary of at most SUMMARY_TOKEN_BUDGET tokens
+summary_prompt = """Update the summary of a SuperPro Designer support conversation with the messages below.
+Keep the user's goals, the details of their process (procedures, equipment, numbers, settings) and the answers and conclusions reached; leave out greetings and repeated explanations.
+Reply with the updated summary only, in at most {words} words.
+
+Current summary:
+{summary}
+
+Messages:
+{messages}"""
+
 def init_requesty():
-    """Initialize OpenAI client with Requesty base URL"""
-    return openai.OpenAI(
+    """Shared OpenAI client with Requesty base URL, reused across reruns and sessions"""
+    return get_openai_client(
         base_url="https://router.requesty.ai/v1",
         api_key=st.secrets["REQUESTY_API_KEY"],
-        default_headers={
+        headers={
             "HTTP-Referer": "http://localhost:8888",
             "X-Title": "SuperPro Manual Assistant"
         }
     )
 
-def process_with_llm(query: str, context: str, requesty_api_key: str):
-    client = init_requesty()
-    
+def answer_cache_key(query: str, source: str, history: List[Dict[str, str]]) -> str:
+    """Answers are cached by model, template version, normalized question, conversation history, manual source
+    and sampling settings; the first question of a conversation has no history, so it is shared across users"""
+    return make_key(CHATBOT_MODEL, CHATBOT_TEMPLATE_VERSION, normalize_query(query), history=history,
+                    source=source, temperature=0.7)
+
+def summarize_turns(summary: str, messages: List[Dict[str, str]]) -> str:
+    """Fold chat messages into the rolling conversation summary with the model"""
+    prompt = summary_prompt.format(
+        words=SUMMARY_TOKEN_BUDGET * 3 // 4,
+        summary=summary or "(none)",
+        messages="\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+    )
+    cache_key = make_key(CHATBOT_MODEL, CHATBOT_TEMPLATE_VERSION, prompt, temperature=0)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    response = init_requesty().chat.completions.create(
+        model=CHATBOT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=SUMMARY_TOKEN_BUDGET
+    )
+    summary = response.choices[0].message.content
+    if not summary:
+        # ChatMemory falls back to the extractive summary
+        raise ValueError("The model returned an empty summary")
+    response_cache.put(cache_key, summary)
+    return summary
+
+def process_with_llm(query: str, context: str, requesty_api_key: str, cache_key: str = None,
+                     history: Optional[List[Dict[str, str]]] = None):
+    """Stream the answer to query after the conversation history; a complete answer is stored under cache_key"""
     messages = [
         {"role": "system", "content": custom_prompt.format(query=query, context=context)},
+        *(history or []),
         {"role": "user", "content": query}
     ]
-
+    
+    client = init_requesty()
     try:
         # Create a completion with streaming
         response = client.chat.completions.create(
-            model="google/gemini-2.0-flash-001",
+            model=CHATBOT_MODEL,
             messages=messages,
             temperature=0.7,
             stream=True
         )
         
         # Process the stream
+        parts = []
         for chunk in response:
             if chunk.choices[0].delta.content is not None:
+                parts.append(chunk.choices[0].delta.content)
                 yield chunk.choices[0].delta.content
+        text = ''.join(parts)
+        if cache_key is not None and text:
+            response_cache.put(cache_key, text)
     except Exception as e:
         print(f"Streaming error: {str(e)}")
         try:
             # Fallback to non-streaming
             response = client.chat.completions.create(
-                model="google/gemini-2.0-flash-001",
+                model=CHATBOT_MODEL,
                 messages=messages,
                 temperature=0.7,
                 stream=False
             )
-            yield response.choices[0].message.content
+            text = response.choices[0].message.content
+            if cache_key is not None and text:
+                response_cache.put(cache_key, text)
+            yield text or ""
         except Exception as e:
             print(f"Non-streaming fallback error: {str(e)}")
             yield f"Error: {str(e)}"
 
-def get_superpro_help(query: str, client: R2RClient, requesty_api_key: str):
-    """Function to query the SuperPro Designer knowledge base"""
+def search_manual(query: str, client: Union[R2RClient, ManualIndex]):
+    """Texts of the top manual chunks for query, from the local index or from R2R"""
+    if isinstance(client, ManualIndex):
+        return client.search(query, SEARCH_LIMIT)
+    chunks = client.retrieval.search(
+        query=query,
+        search_settings={
+            "limit": SEARCH_LIMIT
+        }
+    )
+    return [chunk["text"] for chunk in chunks["results"]["chunk_search_results"]]
+
+def get_superpro_help(query: str, client: Union[R2RClient, ManualIndex], requesty_api_key: str,
+                      use_cache: bool = True, on_context: Optional[Callable[[PackedContext], None]] = None,
+                      memory: Optional[ChatMemory] = None):
+    """Function to query the SuperPro Designer knowledge base.
+
+    client is the R2R client or the local manual index. Answers and R2R results are cached
+    by normalized question, so a question asked before (by any user) is answered without
+    searching or calling the model. With use_cache False both are fetched again and the
+    cached entries refreshed. on_context receives the packed context of a new answer.
+    memory holds the conversation so far: its summary and recent messages go with the
+    question, and the previous question joins the search so follow-ups find their topic.
+    """
+    local = isinstance(client, ManualIndex)
+    history = memory.prompt_messages() if memory is not None else []
+    cache_key = answer_cache_key(query, "local" if local else "r2r", history)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    search_query = f"{memory.last_question()}\n{query}" if memory is not None and memory.messages else query
     try:
-        # Get top 30 chunks
-        chunks = client.retrieval.search(
-            query=query,
-            search_settings={
-                "limit": 30
-            }
-        )
+        if local:
+            # The local index answers in milliseconds, faster than a cache lookup
+            chunks = search_manual(search_query, client)
+        else:
+            chunks = retrieval_cache.search(search_query, lambda q: search_manual(q, client), read_cache=use_cache,
+                                            limit=SEARCH_LIMIT)
         
-        # Join chunks into context
-        context = "\n\n".join([chunk["text"] for chunk in chunks["results"]["chunk_search_results"]])
+        # Drop duplicate passages and keep the most relevant chunks within the token budget
+        packed = pack_context(query, chunks, CONTEXT_TOKEN_BUDGET)
+        if on_context is not None:
+            on_context(packed)
         
         # Process with LLM
-        yield from process_with_llm(query, context, requesty_api_key)
+        yield from process_with_llm(query, packed.text, requesty_api_key, cache_key, history)
     except Exception as e:
         yield f"Error: {str(e)}"
 
 # Main interface
-# Initialize client
-client = R2RClient("https://api.cloud.sciphi.ai")
-os.environ["R2R_API_KEY"] = st.secrets["R2R_API_KEY"]
+# The local manual index (built with `python -m utils.manual_index build`) searches in-process;
+# the shared R2R client is created once per server process
+manual_index = load_manual_index()
+sources = (["Local index"] if manual_index is not None else []) + ["R2R cloud"]
+source = sources[0]
+if len(sources) > 1:
+    source = st.radio("Manual search", sources, horizontal=True,
+                      help="The local index runs offline in milliseconds; R2R searches the hosted knowledge base")
+if source == "Local index":
+    client = manual_index
+else:
+    client = get_r2r_client("https://api.cloud.sciphi.ai", st.secrets["R2R_API_KEY"])
 requesty_api_key = st.secrets["REQUESTY_API_KEY"]
 
-# Query input
-user_query = st.text_input("Enter your SuperPro Designer question:", 
-                          placeholder="e.g., How do I set up a batch process simulation?")
+bypass_cache = st.checkbox("Bypass response cache",
+                           help="Search the manual and ask the model again instead of reusing the answer cached for the same question")
+
+# Conversation of this session: the full transcript for display, and the bounded memory sent to the model
+new_conversation = st.button("New conversation")
+if new_conversation or 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ChatMemory()
+    st.session_state.chat_transcript = []
+memory = st.session_state.chat_memory
+transcript = st.session_state.chat_transcript
+
+# Reruns (any widget interaction) redraw the conversation instead of asking again
+for message in transcript:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        if message.get("caption"):
+            st.caption(message["caption"])
+
+user_query = st.chat_input("Ask a SuperPro Designer question, e.g. How do I set up a batch process simulation?")
 
 if user_query:
-    response_container = st.empty()
-    
-    # Process the response
-    accumulated_text = ""
-    for chunk in get_superpro_help(user_query, client, requesty_api_key):
-        accumulated_text += chunk
-        response_container.markdown("### Response\n" + accumulated_text)
-    
-    # Add a divider
-    st.markdown("---")
-    
-    # Show previous questions (if any)
-    if 'previous_queries' not in st.session_state:
-        st.session_state.previous_queries = []
-    
-    if user_query not in st.session_state.previous_queries:
-        st.session_state.previous_queries.append(user_query)
-    
-    if st.session_state.previous_queries:
-        st.markdown("### Previous Questions")
-        for q in reversed(st.session_state.previous_queries[-5:]):  # Show last 5 questions
-            st.text(f"• {q}")
+    with st.chat_message("user"):
+        st.markdown(user_query)
+    transcript.append({"role": "user", "content": user_query})
+
+    with st.chat_message("assistant"):
+        response_container = st.empty()
+        accumulated_text = ""
+        packed_contexts = []
+        for chunk in get_superpro_help(user_query, client, requesty_api_key, use_cache=not bypass_cache,
+                                       on_context=packed_contexts.append, memory=memory):
+            accumulated_text += chunk
+            response_container.markdown(accumulated_text)
+        # Cached answers didn't need a context
+        context_summary = f"Context: {packed_contexts[0].summary()}" if packed_contexts else "Answer served from cache"
+
+        # Failed answers stay on screen but out of the model's memory
+        if not accumulated_text.startswith("Error:"):
+            memory.add("user", user_query)
+            memory.add("assistant", accumulated_text)
+            # Fold older turns into the summary so the next prompt stays within the history budget
+            if memory.compact(summarize_turns):
+                context_summary += "; earlier turns summarized"
+        context_summary += f" · conversation memory: {memory.tokens():,} tokens"
+        st.caption(context_summary)
+    transcript.append({"role": "assistant", "content": accumulated_text, "caption": context_summary})
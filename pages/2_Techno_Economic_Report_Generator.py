@@ -7,14 +7,24 @@ import pandas as pd
 import io
 import os
 from datetime import datetime
-import openai
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from utils.http_clients import get_async_openai_client
+from excel_reader_for_llm import dataframe_to_text
+from utils.workbook_cache import workbook_cache, file_digest
+from utils.markdown_docx import add_markdown, create_document
+from utils.report_engine import IncrementalMarkdown, ReportSection, generate_report
+from utils.prompt_compaction import compact_table_text
+from utils.llm_cache import response_cache
 
 # Page config
 st.set_page_config(page_title="Techno-economic Report Generator", page_icon="💸")
 
+# Part of the response cache key; bump when responses to the same prompts should no longer be reused
+REPORT_TEMPLATE_VERSION = "1"
+# Token budgets for the sheet data of each prompt
+DATA_TOKEN_BUDGETS = {"technical": 30000, "results": 30000, "discussion": 8000}
+# EER sections the discussion template works from; the results section brings the details
+DISCUSSION_EER_SECTIONS = ["EXECUTIVE SUMMARY", "DIRECT FIXED CAPITAL", "FACILITY-DEPENDENT", "ANNUAL OPERATING COST"]
+
 # Title and description
 st.title("Techno-economic Report Generator")
 with st.expander("Instructions", expanded=False):
@@ -41,33 +51,44 @@ with st.expander("Instructions", expanded=False):
     """)
 
 def init_openrouter():
-    """Initialize OpenAI client with OpenRouter base URL"""
-    return openai.OpenAI(
+    """Shared async OpenAI client with OpenRouter base URL, reused across reruns and sessions"""
+    return get_async_openai_client(
         base_url="https://openrouter.ai/api/v1",
         api_key=st.secrets["OPENROUTER_API_KEY"],
-        default_headers={
+        headers={
             "HTTP-Referer": "https://github.com/yourusername/yourrepo",
             "X-Title": "TEA Analysis Tool"
         }
     )
 
 def init_requesty():
-    """Initialize OpenAI client with Requesty base URL"""
-    return openai.OpenAI(
+    """Shared async OpenAI client with Requesty base URL, reused across reruns and sessions"""
+    return get_async_openai_client(
         base_url="https://router.requesty.ai/v1",
         api_key=st.secrets["REQUESTY_API_KEY"],
-        default_headers={
+        headers={
             "HTTP-Referer": "https://github.com/yourusername/yourrepo",
             "X-Title": "TEA Analysis Tool"
         }
     )
 
 def process_excel_file(file):
-    """Process Excel file and return selected sheets as dataframes."""
+    """Process Excel file and return selected sheets as dataframes.
+    
+    Parsed sheets are kept in the shared workbook cache, keyed by the SHA-256 of the
+    file content and the sheet name, so reruns don't parse the same upload again.
+    """
     try:
-        # Read all sheets
-        xls = pd.ExcelFile(file)
-        sheets = xls.sheet_names
+        content = file.getvalue()
+        digest = file_digest(content)
+        xls = None
+        
+        # Read sheet names
+        sheets = workbook_cache.get(('sheet_names', digest))
+        if sheets is None:
+            xls = pd.ExcelFile(io.BytesIO(content))
+            sheets = xls.sheet_names
+            workbook_cache.put(('sheet_names', digest), sheets)
         
         if len(sheets) > 1:
             selected_sheets = st.multiselect(
@@ -77,226 +98,22 @@ def process_excel_file(file):
             )
         else:
             selected_sheets = sheets
-            
-        return {sheet: pd.read_excel(file, sheet_name=sheet) for sheet in selected_sheets}
+        
+        dataframes = {}
+        for sheet in selected_sheets:
+            key = ('sheet', digest, sheet)
+            df = workbook_cache.get(key)
+            if df is None:
+                if xls is None:
+                    xls = pd.ExcelFile(io.BytesIO(content))
+                df = xls.parse(sheet)
+                workbook_cache.put(key, df)
+            dataframes[sheet] = df
+        return dataframes
     except Exception as e:
         st.error(f"Error processing {file.name}: {str(e)}")
         return {}
 
-def dataframe_to_text(df):
-    """Convert DataFrame to plain text, excluding empty cells."""
-    # Drop completely empty rows and columns
-    df = df.dropna(how='all').dropna(axis=1, how='all')
-    
-    # Convert to string and replace NaN with empty string
-    text_table = df.fillna('').astype(str)
-    
-    # Generate text representation
-    rows = []
-    # Add header
-    headers = '\t'.join(str(col) for col in text_table.columns)
-    rows.append(headers)
-    
-    # Add data rows
-    for _, row in text_table.iterrows():
-        # Only include non-empty cells
-        row_values = [str(val) for val in row if str(val).strip() != '']
-        if row_values:  # Only add row if it has non-empty values
-            rows.append('\t'.join(row_values))
-    
-    return '\n'.join(rows)
-
-def create_docx(content):
-    """Create a DOCX document with proper markdown formatting."""
-    doc = Document()
-    
-    # Define styles
-    styles = doc.styles
-    
-    # Normal style
-    normal_style = styles['Normal']
-    normal_font = normal_style.font
-    normal_font.size = Pt(12)
-    normal_style.paragraph_format.space_after = Pt(12)
-    normal_style.paragraph_format.line_spacing = 1.15
-    
-    # Add title
-    title = doc.add_paragraph("Techno-Economic Analysis Report")
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title_run = title.runs[0]
-    title_run.font.size = Pt(16)
-    title_run.font.bold = True
-    
-    def process_text_formatting(text):
-        """Process bold and italic markdown within text."""
-        parts = []
-        current_text = ""
-        in_bold = False
-        in_italic = False
-        i = 0
-        
-        while i < len(text):
-            if text[i:i+2] == '**' and not in_italic:
-                if in_bold:
-                    parts.append((current_text, True, False))
-                    current_text = ""
-                    in_bold = False
-                    i += 2
-                else:
-                    if current_text:
-                        parts.append((current_text, False, False))
-                    current_text = ""
-                    in_bold = True
-                    i += 2
-            elif text[i:i+1] == '*' and not in_bold:
-                if in_italic:
-                    parts.append((current_text, False, True))
-                    current_text = ""
-                    in_italic = False
-                    i += 1
-                else:
-                    if current_text:
-                        parts.append((current_text, False, False))
-                    current_text = ""
-                    in_italic = True
-                    i += 1
-            else:
-                current_text += text[i]
-                i += 1
-        
-        if current_text:
-            parts.append((current_text, in_bold, in_italic))
-        
-        return parts
-    
-    # Process content
-    lines = content.split('\n')
-    current_paragraph = None
-    list_level = 0
-    in_code_block = False
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()  # Preserve leading whitespace
-        
-        # Skip empty lines but add paragraph breaks
-        if not line:
-            current_paragraph = None
-            i += 1
-            continue
-            
-        # Handle code blocks
-        if line.startswith('```'):
-            in_code_block = not in_code_block
-            if in_code_block:
-                current_paragraph = doc.add_paragraph()
-                current_paragraph.style = 'No Spacing'
-                current_paragraph.paragraph_format.space_before = Pt(6)
-                current_paragraph.paragraph_format.space_after = Pt(6)
-            i += 1
-            continue
-            
-        if in_code_block:
-            if current_paragraph:
-                current_paragraph.add_run(line + '\n')
-            else:
-                current_paragraph = doc.add_paragraph(line + '\n')
-            current_paragraph.style = 'No Spacing'
-            i += 1
-            continue
-            
-        # Handle headings (including numbered sections)
-        if line.startswith('#'):
-            level = len(line.split()[0])  # Count the number of #
-            text = line.lstrip('#').strip()
-            p = doc.add_paragraph(text)
-            p.style = f'Heading {min(level, 3)}'
-            p.paragraph_format.space_before = Pt(12)
-            current_paragraph = None
-        elif any(line.startswith(f"{n}." ) for n in range(1, 10)) and ":" in line:
-            # Handle numbered sections with colons (e.g., "2.1 Methods:")
-            p = doc.add_paragraph(line)
-            p.style = 'Heading 2'
-            p.paragraph_format.space_before = Pt(12)
-            current_paragraph = None
-            
-        # Handle bullet points and nested lists
-        elif line.lstrip().startswith('- ') or line.lstrip().startswith('* '):
-            indent = len(line) - len(line.lstrip())
-            level = indent // 2
-            
-            # Extract the actual content
-            content = line.lstrip('- ').lstrip('* ').strip()
-            
-            if current_paragraph is None or current_paragraph.style.name != 'List Bullet' or list_level != level:
-                current_paragraph = doc.add_paragraph()
-                current_paragraph.style = 'List Bullet'
-                # Adjust indentation for nested lists
-                current_paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
-                list_level = level
-                
-                # Process formatting in bullet point content
-                for text, is_bold, is_italic in process_text_formatting(content):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-            else:
-                current_paragraph.add_run('\n')
-                for text, is_bold, is_italic in process_text_formatting(content):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-            
-        # Handle numbered lists
-        elif line.lstrip().startswith(tuple(f"{n}." for n in range(1, 10))):
-            indent = len(line) - len(line.lstrip())
-            level = indent // 2
-            
-            # Extract the actual content
-            content = line.lstrip('123456789.').strip()
-            
-            if current_paragraph is None or current_paragraph.style.name != 'List Number' or list_level != level:
-                current_paragraph = doc.add_paragraph()
-                current_paragraph.style = 'List Number'
-                # Adjust indentation for nested lists
-                current_paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
-                list_level = level
-                
-                # Process formatting in numbered list content
-                for text, is_bold, is_italic in process_text_formatting(content):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-            else:
-                current_paragraph.add_run('\n')
-                for text, is_bold, is_italic in process_text_formatting(content):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-            
-        # Regular paragraphs
-        else:
-            if current_paragraph is None or current_paragraph.style.name in ['List Bullet', 'List Number']:
-                current_paragraph = doc.add_paragraph()
-                current_paragraph.style = 'Normal'
-                list_level = 0
-                
-                # Process formatting in paragraph content
-                for text, is_bold, is_italic in process_text_formatting(line):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-            else:
-                current_paragraph.add_run('\n')
-                for text, is_bold, is_italic in process_text_formatting(line):
-                    run = current_paragraph.add_run(text)
-                    run.bold = is_bold
-                    run.italic = is_italic
-        
-        i += 1
-    
-    return doc
-
 # Main interface
 # File upload section with consistent spacing
 st.subheader("Upload Files")
@@ -313,6 +130,8 @@ with col2:
 st.markdown("---")  # Add a separator
 
 if idr_file and eer_file:
+    bypass_cache = st.checkbox("Bypass response cache",
+                               help="Call the models again instead of reusing the responses cached for the same inputs")
     if st.button("Generate Report"):
         with st.spinner("Processing files and generating report..."):
                 # Process IDR file
@@ -325,11 +144,19 @@ if idr_file and eer_file:
                 eer_data = process_excel_file(eer_file)
                 eer_text = "\n\n".join(dataframe_to_text(df) for df in eer_data.values())
                 
-                # Initialize OpenRouter client for technical sections
-                client = init_openrouter()
+                # Compact the sheet data to the token budget of each prompt
+                technical_data = compact_table_text(idr_text, max_tokens=DATA_TOKEN_BUDGETS["technical"])
+                results_data = compact_table_text(eer_text, max_tokens=DATA_TOKEN_BUDGETS["results"])
+                discussion_data = compact_table_text(eer_text, max_tokens=DATA_TOKEN_BUDGETS["discussion"],
+                                                     sections=DISCUSSION_EER_SECTIONS)
+                compacted = [technical_data, results_data, discussion_data]
+                original_tokens = sum(data.original_tokens for data in compacted)
+                saved_tokens = sum(data.saved_tokens for data in compacted)
+                st.text(f"Prompt data compacted: saved {saved_tokens:,} of {original_tokens:,} tokens "
+                        f"(technical {technical_data.summary()}, results {results_data.summary()}, "
+                        f"discussion {discussion_data.summary()})")
                 
-                # Generate technical sections
-                st.text("Generating technical analysis...")
+                # Technical sections from the IDR (OpenRouter)
                 technical_prompt = f"""You are a professional technical writer specializing in bioprocess engineering. Based on the provided process design data, analyze the process and generate the introduction and methods sections of a techno-economic report.
 
 IMPORTANT: Format your response using proper markdown syntax:
@@ -341,7 +168,7 @@ IMPORTANT: Format your response using proper markdown syntax:
 - Each section must start with a proper header using # or ##
 
 Data:
-{idr_text}
+{technical_data.text}
 
 Please analyze the data and generate the following sections using markdown formatting:
 
@@ -375,18 +202,8 @@ Generate a concise and relevant title for this techno-economic analysis.
 - Labor requirements
 - Resource allocations"""
 
-                technical_response = client.chat.completions.create(
-                    model="google/gemini-2.0-flash-001",
-                    messages=[{"role": "user", "content": technical_prompt}]
-                )
-                technical_sections = technical_response.choices[0].message.content
-                
-                # Initialize Requesty client for economic sections
-                requesty_client = init_requesty()
-                
-                # Generate economic sections
-                st.text("Generating economic analysis...")
-                economic_prompt = f"""You are a professional technical writer specializing in bioprocess engineering. Based on the provided economic data, analyze the economic aspects and generate the remaining sections of a techno-economic report.
+                # Results from the EER only, so they don't have to wait for the technical sections (Requesty)
+                results_prompt = f"""You are a professional technical writer specializing in bioprocess engineering. Based on the provided economic data, analyze the economic aspects and generate the results section of a techno-economic report.
 
 IMPORTANT: Format your response using proper markdown syntax:
 - Use # for main headers (e.g., # 3. Results)
@@ -397,13 +214,10 @@ IMPORTANT: Format your response using proper markdown syntax:
 - Maintain a professional, analytical tone throughout
 - Focus solely on analyzing the provided data
 
-Previous Sections Context:
-{technical_sections}
-
 Data:
-{eer_text}
+{results_data.text}
 
-Generate the following sections using markdown formatting:
+Generate the following section using markdown formatting:
 
 # 3. Results
 
@@ -426,7 +240,30 @@ Examine the indirect costs associated with facility operation and maintenance. A
 Present a detailed analysis of the production-related performance indicators. Explain how production capacity relates to resource utilization and operational efficiency. Use specific figures from the data to illustrate the process performance.
 
 ## 3.3.2 Financial Metrics
-Analyze the key financial indicators that demonstrate the project's economic performance. Explain the relationships between different financial metrics and what they reveal about the process economics. Include specific numbers from the data to support your analysis.
+Analyze the key financial indicators that demonstrate the project's economic performance. Explain the relationships between different financial metrics and what they reveal about the process economics. Include specific numbers from the data to support your analysis."""
+
+                # Discussion and conclusions build on both previous sections (Requesty)
+                def discussion_prompt(context):
+                    return f"""You are a professional technical writer specializing in bioprocess engineering. Based on the provided economic data and the previous sections, generate the remaining sections of a techno-economic report.
+
+IMPORTANT: Format your response using proper markdown syntax:
+- Use # for main headers (e.g., # 4. Discussion)
+- Use ## for subheaders (e.g., ## 4.1 Cost Analysis)
+- Write in clear, flowing paragraphs
+- Use data points from the provided information to support your analysis
+- Each section must start with a proper header using # or ##
+- Maintain a professional, analytical tone throughout
+- Focus solely on analyzing the provided data
+
+Previous Sections Context:
+{context['technical']}
+
+{context['results']}
+
+Data:
+{discussion_data.text}
+
+Generate the following sections using markdown formatting:
 
 # 4. Discussion
 ## 4.1 Cost Analysis
@@ -442,17 +279,44 @@ Summarize the most significant economic findings from the analysis. Present clea
 ## 5.2 Recommendations
 Provide specific, data-driven recommendations for improving economic performance. Prioritize suggestions based on their potential impact and feasibility. Focus on practical improvements that are supported by the economic analysis."""
 
-                economic_response = requesty_client.chat.completions.create(
-                    model="cline/o3-mini",
-                    messages=[{"role": "user", "content": economic_prompt}]
-                )
+                # Technical and results sections run concurrently, the discussion waits for both
+                openrouter_client = init_openrouter()
+                requesty_client = init_requesty()
+                sections = [
+                    ReportSection("technical", openrouter_client, "google/gemini-2.0-flash-001", technical_prompt,
+                                  template_version=REPORT_TEMPLATE_VERSION),
+                    ReportSection("results", requesty_client, "cline/o3-mini", results_prompt,
+                                  template_version=REPORT_TEMPLATE_VERSION),
+                    ReportSection("discussion", requesty_client, "cline/o3-mini", discussion_prompt,
+                                  depends_on=("technical", "results"), template_version=REPORT_TEMPLATE_VERSION),
+                ]
+                section_labels = {
+                    "technical": "Technical analysis",
+                    "results": "Economic results",
+                    "discussion": "Discussion and recommendations",
+                }
+                st.text("Generating technical and economic analysis...")
+                progress = st.empty()
+                
+                # Stream the sections into the preview, and convert completed blocks to DOCX as they arrive
+                st.markdown("### Report Preview")
+                previews = {section.name: st.empty() for section in sections}
+                section_texts = {section.name: "" for section in sections}
+                doc = create_document("Techno-Economic Analysis Report")
+                markdown_blocks = IncrementalMarkdown(
+                    list(previews), lambda block: add_markdown(doc, block, numbered_headings=True))
                 
-                # Combine sections
-                full_report = technical_sections + "\n\n" + economic_response.choices[0].message.content
+                def show_delta(name, delta):
+                    section_texts[name] += delta
+                    previews[name].markdown(section_texts[name])
+                    markdown_blocks.feed(name, delta)
                 
-                # Create document
-                st.text("Formatting document...")
-                doc = create_docx(full_report)
+                def finish_section(name, _):
+                    markdown_blocks.finish(name)
+                    progress.text(f"{section_labels[name]} completed")
+                
+                generate_report(sections, on_section_done=finish_section, on_delta=show_delta,
+                                cache=response_cache, read_cache=not bypass_cache)
                 
                 # Save document
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -468,7 +332,3 @@ Provide specific, data-driven recommendations for improving economic performance
                     file_name=output_filename,
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                 )
-                
-                # Display preview
-                st.markdown("### Report Preview")
-                st.markdown(full_report)
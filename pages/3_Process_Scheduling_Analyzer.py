@@ -3,18 +3,29 @@ from utils.check_auth import check_auth
 
 # Check authentication
 check_auth()
-import pandas as pd
 import io
-import os
 from datetime import datetime
-import openai
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from utils.http_clients import get_async_openai_client
+from scheduling_parser import parse_scheduling_file
+from scheduling_metrics import PROMPT_EQUIPMENT_ROWS, compute_schedule_metrics
+from utils.markdown_docx import add_markdown, add_table, create_document
+from utils.report_engine import IncrementalMarkdown, ReportSection, generate_report
+from utils.llm_cache import response_cache
+from utils.prompt_compaction import chunk_sections, estimate_tokens
 
 # Page config
 st.set_page_config(page_title="Scheduling Analyzer", page_icon="📅")
 
+# Part of the response cache key; bump when responses to the same prompt should no longer be reused
+ANALYSIS_TEMPLATE_VERSION = "3"
+ANALYSIS_MODEL = "cline/o3-mini"
+# o3-mini context window, and the part of it kept free for reasoning and the response
+MODEL_CONTEXT_TOKENS = 200000
+RESPONSE_RESERVE_TOKENS = 100000
+# Defaults of the map-reduce mode for large exports
+DEFAULT_CHUNK_TOKENS = 8000
+DEFAULT_MAX_CONCURRENCY = 4
+
 # Title and description
 st.title("Process Scheduling Analysis Tool")
 with st.expander("Instructions", expanded=False):
@@ -54,196 +65,35 @@ with st.expander("Instructions", expanded=False):
      """)
 
 def init_requesty():
-    """Initialize OpenAI client with Requesty base URL"""
-    return openai.OpenAI(
+    """Shared async OpenAI client with Requesty base URL, reused across reruns and sessions"""
+    return get_async_openai_client(
         base_url="https://router.requesty.ai/v1",
         api_key=st.secrets["REQUESTY_API_KEY"],
-        default_headers={
+        headers={
             "HTTP-Referer": "https://github.com/yourusername/yourrepo",
             "X-Title": "Process Scheduling Analysis Tool"
         }
     )
 
-def parse_scheduling_data(content):
-    """Parse the scheduling data text content and return formatted text."""
-    sections = []
-    current_section = []
-    lines = content.split('\n')
-    
-    # Process each line
-    for line in lines:
-        # Check if line is empty without stripping
-        if not line.strip():
-            if current_section:  # If we have a section built up
-                sections.append('\n'.join(current_section))
-                current_section = []
-            continue
-            
-        # Check for section separator without modifying the line
-        if '****' in line:  # Section separator
-            if current_section:  # If we have a section built up
-                sections.append('\n'.join(current_section))
-                current_section = []
-            current_section.append(line)
-        else:
-            # Add the line exactly as is, preserving all whitespace and tabs
-            current_section.append(line)
-    
-    # Add any remaining section
-    if current_section:
-        sections.append('\n'.join(current_section))
-    
-    # Format output text
-    formatted_text = []
-    
-    # Process each section
-    for section in sections:
-        lines = section.split('\n')
-        
-        # Skip empty sections
-        if not any(line.strip() for line in lines):
-            continue
-            
-        # Add section to formatted text
-        formatted_text.append('\n'.join(lines))
-    
-    return '\n\n'.join(formatted_text)
+def build_chunk_prompt(chunk, part, parts):
+    """Build the prompt extracting the findings of one part of a large scheduling dataset."""
+    return f"""You will be analyzing part {part} of {parts} of a detailed process scheduling dataset from SuperPro Designer. The data is presented in a tabular format. Your findings will be merged with those of the other parts into a full scheduling analysis.
 
-def create_docx(content):
-    """Create a DOCX document with proper markdown formatting."""
-    doc = Document()
-    
-    # Define styles
-    styles = doc.styles
-    
-    # Normal style
-    normal_style = styles['Normal']
-    normal_font = normal_style.font
-    normal_font.size = Pt(12)
-    normal_style.paragraph_format.space_after = Pt(12)
-    normal_style.paragraph_format.line_spacing = 1.15
-    
-    # Add title
-    title = doc.add_paragraph("Process Scheduling Analysis Report")
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title_run = title.runs[0]
-    title_run.font.size = Pt(16)
-    title_run.font.bold = True
-    
-    # Process content
-    lines = content.split('\n')
-    current_paragraph = None
-    list_level = 0
-    in_code_block = False
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()  # Preserve leading whitespace
-        
-        # Skip empty lines but add paragraph breaks
-        if not line:
-            current_paragraph = None
-            i += 1
-            continue
-            
-        # Handle code blocks
-        if line.startswith('```'):
-            in_code_block = not in_code_block
-            if in_code_block:
-                current_paragraph = doc.add_paragraph()
-                current_paragraph.style = 'No Spacing'
-                current_paragraph.paragraph_format.space_before = Pt(6)
-                current_paragraph.paragraph_format.space_after = Pt(6)
-            i += 1
-            continue
-            
-        if in_code_block:
-            if current_paragraph:
-                current_paragraph.add_run(line + '\n')
-            else:
-                current_paragraph = doc.add_paragraph(line + '\n')
-            current_paragraph.style = 'No Spacing'
-            i += 1
-            continue
-            
-        # Handle headings
-        if line.startswith('#'):
-            level = len(line.split()[0])  # Count the number of #
-            text = line.lstrip('#').strip()
-            p = doc.add_paragraph(text)
-            p.style = f'Heading {min(level, 3)}'
-            p.paragraph_format.space_before = Pt(12)
-            current_paragraph = None
-            
-        # Handle bullet points and nested lists
-        elif line.lstrip().startswith('- ') or line.lstrip().startswith('* '):
-            indent = len(line) - len(line.lstrip())
-            level = indent // 2
-            
-            # Extract the actual content
-            content = line.lstrip('- ').lstrip('* ').strip()
-            
-            if current_paragraph is None or current_paragraph.style.name != 'List Bullet' or list_level != level:
-                current_paragraph = doc.add_paragraph(content)
-                current_paragraph.style = 'List Bullet'
-                # Adjust indentation for nested lists
-                current_paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
-                list_level = level
-            else:
-                current_paragraph.add_run('\n' + content)
-            
-        # Handle numbered lists
-        elif line.lstrip().startswith(tuple(f"{n}." for n in range(1, 10))):
-            indent = len(line) - len(line.lstrip())
-            level = indent // 2
-            
-            # Extract the actual content
-            content = line.lstrip('123456789.').strip()
-            
-            if current_paragraph is None or current_paragraph.style.name != 'List Number' or list_level != level:
-                current_paragraph = doc.add_paragraph(content)
-                current_paragraph.style = 'List Number'
-                # Adjust indentation for nested lists
-                current_paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
-                list_level = level
-            else:
-                current_paragraph.add_run('\n' + content)
-            
-        # Regular paragraphs
-        else:
-            if current_paragraph is None or current_paragraph.style.name in ['List Bullet', 'List Number']:
-                current_paragraph = doc.add_paragraph(line)
-                current_paragraph.style = 'Normal'
-                list_level = 0
-            else:
-                current_paragraph.add_run('\n' + line)
-        
-        i += 1
-    
-    return doc
+Extract concise, factual findings from this part only, as markdown bullet points grouped under these headers:
+## Procedures and Equipment
+## Timing (setup, process and turnover times, cycle times)
+## Bottlenecks and Conflicts
+## Cleaning and Maintenance
+## Campaigns and Batches
 
-# Main interface
-# File upload
-uploaded_file = st.file_uploader("Upload scheduling data file", type=['xls', 'xlsx'])
+Reference specific procedures, equipment and timing values from the tables. Do not write recommendations or an introduction, and skip headers for which this part has no data.
 
-if uploaded_file:
-    if st.button("Analyze Schedule"):
-        with st.spinner("Analyzing scheduling data..."):
-            # Read file content
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            # Read all files as text since the .xls file is actually a text file
-            content = uploaded_file.getvalue().decode('utf-8', errors='replace')
-            
-            # Parse the content
-            formatted_text = parse_scheduling_data(content)
-            
-            # Initialize Requesty client
-            client = init_requesty()
-            
-            # Generate analysis
-            st.text("Generating analysis...")
-            analysis_prompt = f"""You will be analyzing a detailed process scheduling dataset from SuperPro Designer. The data is presented in a tabular format with multiple sections.
+Data:
+{chunk}"""
+
+def build_analysis_prompt(data):
+    """Build the analysis prompt around a data block (the scheduling tables or the findings of a map-reduce run)."""
+    return f"""You will be analyzing a detailed process scheduling dataset from SuperPro Designer. The data is presented as tab-separated tables, with all times in hours.
 
 IMPORTANT: Format your response using proper markdown syntax:
 - Use # for main headers (e.g., # 1. Bottleneck Analysis)
@@ -255,9 +105,13 @@ IMPORTANT: Format your response using proper markdown syntax:
 - Start each main section with a brief overview paragraph
 
 The dataset includes:
+- Computed Schedule Metrics section with the equipment occupancy, idle gaps, scheduling bottleneck, minimum batch spacing and cycle time, computed from the tables. Each figure has a basis: treat figures with basis "parameter" or "computed" as ground truth, quoting them as given without recomputing or contradicting them, and present figures with basis "estimate" as estimates, stating the assumption they rest on
 - Process Parameters section showing operating time, campaigns, and batch information
-- Equipment and Procedure Overview table listing all procedures with their operating modes and equipment
-- Detailed Procedure tables showing operations with timing information (setup, process, and turnover times)
+- Procedures table listing all procedures with their operating modes and equipment
+- Equipment table listing the procedures run in each equipment item and their total time per batch
+- Procedure durations table with the setup, process, turnaround and total times of each procedure
+- Operations tables per procedure with the timing of each operation (setup, process, turnaround, and start/end when available)
+- Any other sections of the export as raw text
 
 Please analyze this structured data and provide insights and recommendations in the following areas:
 
@@ -354,20 +208,113 @@ Please analyze this structured data and provide insights and recommendations in
 - Outline resource needs
 - Define success metrics
 
-Data:
-{formatted_text}
+{data}
 
 For each area, carefully examine the tabular data and provide detailed insights and recommendations. Reference specific procedures, equipment, and timing data from the tables to support your analysis. Pay special attention to the relationships between procedures, their timing, and equipment utilization patterns shown in the data tables."""
 
-            response = client.chat.completions.create(
-                model="cline/o3-mini",
-                messages=[{"role": "user", "content": analysis_prompt}]
-            )
-            analysis_content = response.choices[0].message.content
+# Main interface
+# File upload
+uploaded_file = st.file_uploader("Upload scheduling data file", type=['xls', 'xlsx'])
+
+if uploaded_file:
+    bypass_cache = st.checkbox("Bypass response cache",
+                               help="Call the model again instead of reusing the response cached for the same data")
+    with st.expander("Large exports", expanded=False):
+        analysis_mode = st.radio("Analysis mode", ["Automatic", "Single prompt", "Map-reduce"], horizontal=True,
+                                 help="Map-reduce analyzes the export in chunks concurrently and merges their findings "
+                                      "in a final call. Automatic uses it only when the data doesn't fit in a single "
+                                      "prompt of the model.")
+        chunk_tokens = st.number_input("Chunk size (tokens)", min_value=1000, max_value=100000,
+                                       value=DEFAULT_CHUNK_TOKENS, step=1000)
+        max_concurrency = st.number_input("Concurrent requests", min_value=1, max_value=16,
+                                          value=DEFAULT_MAX_CONCURRENCY)
+    if st.button("Analyze Schedule"):
+        with st.spinner("Analyzing scheduling data..."):
+            # Parse the export into tables; the .xls file is actually a text file
+            schedule = parse_scheduling_file(uploaded_file)
+            st.text(f"Parsed {len(schedule.procedures)} procedures with {len(schedule.operations)} operations "
+                    f"in {len(schedule.equipment)} equipment items")
+            if len(schedule.unparsed):
+                st.warning(f"{len(schedule.unparsed)} time values could not be parsed; they and the totals "
+                           f"including them are left unknown")
+                st.dataframe(schedule.unparsed)
+            sections = schedule.to_prompt_sections()
+            formatted_text = '\n\n'.join(sections)
             
-            # Create document
-            st.text("Formatting document...")
-            doc = create_docx(analysis_content)
+            # Occupancy, bottleneck and cycle time are computed locally and given to the model as facts
+            metrics = compute_schedule_metrics(schedule)
+            metrics_text = metrics.to_prompt_section()
+            st.markdown("### Schedule Metrics")
+            st.table(metrics.summary_table().astype({'value': str}))
+            st.dataframe(metrics.equipment.round(2))
+            
+            client = init_requesty()
+            # Room for the data in a single prompt, next to the template, the metrics and the response
+            single_prompt_tokens = (MODEL_CONTEXT_TOKENS - RESPONSE_RESERVE_TOKENS
+                                    - estimate_tokens(build_analysis_prompt(f"Data:\n{metrics_text}\n\n")))
+            map_reduce = analysis_mode == "Map-reduce" or (
+                analysis_mode == "Automatic" and estimate_tokens(formatted_text) > single_prompt_tokens)
+            if map_reduce:
+                # Analyze the chunks concurrently, then merge their findings into the analysis; tables
+                # split over chunks repeat their title and column header
+                chunks = chunk_sections(sections, int(chunk_tokens), header_lines=2)
+                chunk_names = tuple(f"part_{part}" for part in range(1, len(chunks) + 1))
+                analysis_sections = [
+                    ReportSection(name, client, ANALYSIS_MODEL, build_chunk_prompt(chunk, part, len(chunks)),
+                                  template_version=ANALYSIS_TEMPLATE_VERSION)
+                    for part, (name, chunk) in enumerate(zip(chunk_names, chunks), start=1)
+                ]
+                
+                def synthesis_prompt(context):
+                    findings = "\n\n".join(f"# Findings for part {part} of {len(chunks)}\n{context[name]}"
+                                            for part, name in enumerate(chunk_names, start=1))
+                    return build_analysis_prompt(
+                        f"Data:\n{metrics_text}\n\n"
+                        f"The dataset was too large for a single analysis, so it was split into {len(chunks)} parts "
+                        f"that were analyzed separately. Findings from those parts:\n{findings}")
+                
+                analysis_sections.append(ReportSection("analysis", client, ANALYSIS_MODEL, synthesis_prompt,
+                                                       depends_on=chunk_names,
+                                                       template_version=ANALYSIS_TEMPLATE_VERSION))
+                st.text(f"Analyzing {len(chunks)} chunks of the schedule...")
+            else:
+                analysis_sections = [ReportSection("analysis", client, ANALYSIS_MODEL,
+                                                   build_analysis_prompt(f"Data:\n{metrics_text}\n\n{formatted_text}"),
+                                                   template_version=ANALYSIS_TEMPLATE_VERSION)]
+                st.text("Generating analysis...")
+            progress = st.empty()
+
+            # Stream the analysis into the preview, and convert completed blocks to DOCX as they arrive
+            st.markdown("### Analysis Preview")
+            preview = st.empty()
+            section_texts = {"analysis": ""}
+            doc = create_document("Process Scheduling Analysis Report")
+            # The report opens with the computed metrics as tables
+            add_markdown(doc, "# Schedule Metrics")
+            summary = metrics.summary_table().astype({'value': str})
+            add_table(doc, list(summary.columns), summary.values.tolist())
+            add_markdown(doc, "Equipment occupancy per batch (h, longest first)")
+            occupancy = metrics.equipment.head(PROMPT_EQUIPMENT_ROWS).round(2).reset_index()
+            add_table(doc, list(occupancy.columns), occupancy.astype(str).values.tolist())
+            markdown_blocks = IncrementalMarkdown(list(section_texts), lambda block: add_markdown(doc, block))
+            
+            def show_delta(name, delta):
+                # Only the final analysis is shown; chunk findings are intermediate
+                if name in section_texts:
+                    section_texts[name] += delta
+                    preview.markdown(section_texts[name])
+                    markdown_blocks.feed(name, delta)
+            
+            def finish_section(name, _):
+                if name in section_texts:
+                    markdown_blocks.finish(name)
+                else:
+                    finished_chunks.append(name)
+                    progress.text(f"Analyzed {len(finished_chunks)} of {len(analysis_sections) - 1} chunks")
+            
+            finished_chunks = []
+            generate_report(analysis_sections, on_section_done=finish_section, on_delta=show_delta,
+                            cache=response_cache, read_cache=not bypass_cache, max_concurrency=int(max_concurrency))
             
             # Save document
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -383,7 +330,3 @@ For each area, carefully examine the tabular data and provide detailed insights
                 file_name=output_filename,
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
-            
-            # Display preview
-            st.markdown("### Analysis Preview")
-            st.markdown(analysis_content)
@@ -1,9 +1,8 @@
 import streamlit as st
 from utils.check_auth import check_auth
-import os
-import tempfile
-from excel_reader_for_llm import excel_to_json
-from chart_generation_multiple import main as generate_charts, ChartConfig, ChartGenerator
+from chart_generation_multiple import (MAX_POOL_WORKERS, extract_processes, charts_to_redraw, ChartConfig,
+                                       ChartGenerator, ChartRenderer)
+from utils.workbook_cache import workbook_cache, file_digest
 
 # Check authentication
 check_auth()
@@ -74,6 +73,12 @@ with st.expander("Chart Settings", expanded=False):
     with col2:
         st.session_state.chart_settings.figure_height = st.number_input(
             "Chart Height", 6, 20, 8, help="Height of the chart in inches")
+        parallel_rendering = st.checkbox(
+            "Parallel Rendering", value=False,
+            help="Render the charts in the worker processes shared by all sessions, up to "
+                 f"{MAX_POOL_WORKERS} at a time. Off by default: it only pays off on servers with "
+                 "idle cores, and the first use waits for the workers to start")
+        st.session_state.chart_settings.render_workers = MAX_POOL_WORKERS if parallel_rendering else 1
     
     st.subheader("Text Customization")
     
@@ -99,6 +104,31 @@ with st.expander("Chart Settings", expanded=False):
     if st.button("Reset to Defaults"):
         st.session_state.chart_settings = ChartConfig()
 
+def extract_processes_cached(files, scenario_names):
+    """Extract process data for the uploaded files, parsing only files not already in the workbook cache.
+    
+    Results are keyed by the SHA-256 of the file content, so reruns (e.g. after changing
+    a chart setting) reuse the extracted data across sessions without parsing anything.
+    """
+    contents = [file.getvalue() for file in files]
+    keys = [('process_data', file_digest(content), scenario_name, file.name)
+            for file, content, scenario_name in zip(files, contents, scenario_names)]
+    results = [workbook_cache.get(key) for key in keys]
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        extracted = extract_processes(
+            [contents[i] for i in missing],
+            [scenario_names[i] for i in missing],
+            file_names=[files[i].name for i in missing]
+        )
+        for i, result in zip(missing, extracted):
+            if not isinstance(result, Exception):
+                workbook_cache.put(keys[i], result)
+            results[i] = result
+    
+    return results
+
 # Main interface
 st.subheader("Upload Files")
 
@@ -127,104 +157,65 @@ for i in range(st.session_state.num_files):
         col1, col2 = st.columns([1, 1])
         with col1:
             file = st.file_uploader(f"Upload EER file #{i+1}", type=['xls', 'xlsx'], key=f"file_{i}")
-            if file:
-                uploaded_files.append(file)
         with col2:
             scenario_name = st.text_input("Scenario Name", key=f"scenario_{i}", 
                                         placeholder=f"Scenario {i+1}")
-            if scenario_name:
-                scenario_names.append(scenario_name)
+        if file:
+            uploaded_files.append(file)
+            # Keep names aligned with files (None falls back to the filename)
+            scenario_names.append(scenario_name or None)
 
 if uploaded_files:
     if st.button("Generate Charts"):
         with st.spinner("Processing files and generating charts..."):
             try:
-                # Create temporary directory for processing
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    # Process each file
-                    json_files = []
-                    
-                    # Save uploaded files and convert to JSON
-                    for i, file in enumerate(uploaded_files):
-                        # Save uploaded file
-                        temp_file_path = os.path.join(temp_dir, file.name)
-                        with open(temp_file_path, 'wb') as f:
-                            f.write(file.getvalue())
-                        
-                        # Convert to JSON
-                        try:
-                            json_file = excel_to_json(temp_file_path)
-                            json_files.append(json_file)
-                        except Exception as e:
-                            st.error(f"Error processing {file.name}: {str(e)}")
-                            continue
-                    
-                    if json_files:
-                        # Create output directory for charts
-                        charts_dir = os.path.join(temp_dir, 'charts')
-                        os.makedirs(charts_dir, exist_ok=True)
-                        
-                        # Generate charts
-                        try:
-                            # Initialize or clear charts data in session state
-                            if 'generated_charts' not in st.session_state:
-                                st.session_state.generated_charts = {}
-                            
-                            generate_charts(json_files, scenario_names, charts_dir, config=st.session_state.chart_settings)
-                            
-                            # Display charts
-                            st.subheader("Generated Charts")
-                            
-                            # List all generated chart files
-                            chart_files = [
-                                'AOC.png',
-                                'Materials.png',
-                                'Consumables.png',
-                                'Utilities.png',
-                                'stacked_bar_chart.png'
-                            ]
-                            
-                            # Store available charts and their data
-                            available_charts = {}
-                            
-                            # Display each chart with download button
-                            for chart_file in chart_files:
-                                chart_path = os.path.join(charts_dir, chart_file)
-                                if os.path.exists(chart_path):
-                                    # Read chart file
-                                    with open(chart_path, 'rb') as f:
-                                        chart_data = f.read()
-                                    
-                                    # Store chart data in session state
-                                    st.session_state.generated_charts[chart_file] = {
-                                        'data': chart_data,
-                                        'name': chart_file.replace('.png', '')
-                                    }
-                                    
-                                    # Display chart
-                                    st.image(chart_data, caption=chart_file.replace('.png', ''))
-                                    
-                                    # Add download button
-                                    st.download_button(
-                                        label=f"Download {chart_file}",
-                                        data=chart_data,
-                                        file_name=chart_file,
-                                        mime="image/png",
-                                        key=f"download_gen_{chart_file}"  # Unique key for generated charts
-                                    )
-                                    
-                                    st.markdown("---")  # Add separator between charts
-                            
-                        except Exception as e:
-                            st.error(f"Error generating charts: {str(e)}")
-                    else:
-                        st.error("No files were successfully processed")
+                # Parse and extract uncached files concurrently and in memory, in scenario order
+                processes = []
+                results = extract_processes_cached(uploaded_files, scenario_names)
+                for file, result in zip(uploaded_files, results):
+                    if isinstance(result, Exception):
+                        st.error(f"Error processing {file.name}: {str(result)}")
+                        continue
+                    processes.append(result)
+                
+                if processes:
+                    # Generate charts
+                    try:
+                        # Keep the extracted data so that setting changes only re-render charts
+                        renderer = ChartRenderer(processes)
+                        renderer.render(st.session_state.chart_settings)
+                        st.session_state.chart_renderer = renderer
+                    except Exception as e:
+                        st.error(f"Error generating charts: {str(e)}")
+                else:
+                    st.error("No files were successfully processed")
             
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
 
+# Re-render only the charts affected by changed chart settings
+if 'chart_renderer' in st.session_state:
+    renderer = st.session_state.chart_renderer
+    if charts_to_redraw(renderer.config, st.session_state.chart_settings):
+        with st.spinner("Updating charts..."):
+            try:
+                renderer.render(st.session_state.chart_settings)
+            except Exception as e:
+                st.error(f"Error generating charts: {str(e)}")
+    
+    # Store chart data in session state
+    st.session_state.generated_charts = {
+        chart_file: {
+            'data': chart_data,
+            'name': chart_file.replace('.png', '')
+        }
+        for chart_file, chart_data in renderer.charts.items()
+    }
+
 # Display generated charts and multi-panel figure interface if charts exist
 if 'generated_charts' in st.session_state and st.session_state.generated_charts:
+    st.subheader("Generated Charts")
+    
     # Display each chart with download button
     for chart_file, chart_info in st.session_state.generated_charts.items():
         # Display chart
@@ -251,67 +242,68 @@ if 'generated_charts' in st.session_state and st.session_state.generated_charts:
     # Create columns for chart selection and label assignment
     selected_charts = []
     
-    # Create a temporary directory for multi-panel figure creation
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Save charts to temporary files for multi-panel creation
-        for chart_file, chart_info in st.session_state.generated_charts.items():
-            temp_chart_path = os.path.join(temp_dir, chart_file)
-            with open(temp_chart_path, 'wb') as f:
-                f.write(chart_info['data'])
-            
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                if st.checkbox(f"Include {chart_info['name']}", key=f"select_{chart_file}"):
-                    with col2:
-                        label = st.text_input("Label", 
-                                            key=f"label_{chart_file}",
-                                            max_chars=1,
-                                            placeholder="a",
-                                            help="Single letter label (a, b, c, etc.)")
-                        if label:
-                            selected_charts.append((temp_chart_path, label))
+    # Select charts from the in-memory chart data
+    for chart_file, chart_info in st.session_state.generated_charts.items():
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            if st.checkbox(f"Include {chart_info['name']}", key=f"select_{chart_file}"):
+                with col2:
+                    label = st.text_input("Label", 
+                                        key=f"label_{chart_file}",
+                                        max_chars=1,
+                                        placeholder="a",
+                                        help="Single letter label (a, b, c, etc.)")
+                    if label:
+                        selected_charts.append((chart_file, label))
+    
+    if selected_charts:
+        # Grid layout controls
+        st.subheader("Grid Layout")
+        st.markdown("""
+        Specify the grid layout for your multi-panel figure. The charts will be arranged from left to right, top to bottom.
+        """)
         
-        if selected_charts:
-            # Grid layout controls
-            st.subheader("Grid Layout")
-            st.markdown("""
-            Specify the grid layout for your multi-panel figure. The charts will be arranged from left to right, top to bottom.
-            """)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                n_rows = st.number_input("Number of Rows", min_value=1, max_value=len(selected_charts), 
-                                       value=min(2, len(selected_charts)),
-                                       help="Number of rows in the grid layout")
-            with col2:
-                n_cols = st.number_input("Number of Columns", min_value=1, max_value=len(selected_charts),
-                                       value=min(2, len(selected_charts)),
-                                       help="Number of columns in the grid layout")
-            
-            # Validate grid dimensions
-            total_cells = n_rows * n_cols
-            if total_cells < len(selected_charts):
-                st.error(f"Grid size ({n_rows}×{n_cols} = {total_cells} cells) is too small for {len(selected_charts)} charts. Please increase the number of rows or columns.")
-            else:
-                if st.button("Generate Multi-panel Figure"):
-                    with st.spinner("Creating multi-panel figure..."):
-                        # Generate multi-panel figure
-                        chart_gen = ChartGenerator(temp_dir, config=st.session_state.chart_settings)
-                        chart_gen.create_multi_panel_figure(selected_charts, "multi_panel_figure.png", n_rows=n_rows, n_cols=n_cols)
+        col1, col2 = st.columns(2)
+        with col1:
+            n_rows = st.number_input("Number of Rows", min_value=1, max_value=len(selected_charts), 
+                                   value=min(2, len(selected_charts)),
+                                   help="Number of rows in the grid layout")
+        with col2:
+            n_cols = st.number_input("Number of Columns", min_value=1, max_value=len(selected_charts),
+                                   value=min(2, len(selected_charts)),
+                                   help="Number of columns in the grid layout")
+        
+        # Validate grid dimensions
+        total_cells = n_rows * n_cols
+        if total_cells < len(selected_charts):
+            st.error(f"Grid size ({n_rows}×{n_cols} = {total_cells} cells) is too small for {len(selected_charts)} charts. Please increase the number of rows or columns.")
+        else:
+            if st.button("Generate Multi-panel Figure"):
+                with st.spinner("Creating multi-panel figure..."):
+                    # Draw the panels from the extracted data, or tile the rendered charts
+                    chart_gen = ChartGenerator(None, config=st.session_state.chart_settings)
+                    renderer = st.session_state.get('chart_renderer')
+                    if renderer is not None:
+                        multi_panel = chart_gen.create_multi_panel_figure(
+                            selected_charts, "multi_panel_figure.png", n_rows=n_rows, n_cols=n_cols,
+                            costs=renderer.costs)
+                    else:
+                        multi_panel = chart_gen.create_multi_panel_figure(
+                            [(st.session_state.generated_charts[chart_file]['data'], label)
+                             for chart_file, label in selected_charts],
+                            "multi_panel_figure.png", n_rows=n_rows, n_cols=n_cols)
+                
+                # Display and offer download of multi-panel figure
+                if multi_panel is not None:
+                    multi_panel_data = multi_panel.getvalue()
+                    
+                    st.subheader("Multi-panel Figure")
+                    st.image(multi_panel_data)
                     
-                    # Display and offer download of multi-panel figure
-                    multi_panel_path = os.path.join(temp_dir, "multi_panel_figure.png")
-                    if os.path.exists(multi_panel_path):
-                        with open(multi_panel_path, 'rb') as f:
-                            multi_panel_data = f.read()
-                        
-                        st.subheader("Multi-panel Figure")
-                        st.image(multi_panel_data)
-                        
-                        st.download_button(
-                            label="Download Multi-panel Figure",
-                            data=multi_panel_data,
-                            file_name="multi_panel_figure.png",
-                            mime="image/png",
-                            key="download_multi_panel"  # Unique key for multi-panel figure
-                        )
+                    st.download_button(
+                        label="Download Multi-panel Figure",
+                        data=multi_panel_data,
+                        file_name="multi_panel_figure.png",
+                        mime="image/png",
+                        key="download_multi_panel"  # Unique key for multi-panel figure
+                    )
@@ -0,0 +1,209 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from scheduling_parser import SchedulingData, format_table, parse_scheduling_file
+
+# Equipment rows listed in the prompt, longest occupancy first; the totals cover all equipment
+PROMPT_EQUIPMENT_ROWS = 25
+# No batch runs longer than a year (or the annual operating time); longer start-to-end spans are misread dates
+HOURS_PER_YEAR = 8760.0
+
+@dataclass
+class ScheduleMetrics:
+    """Deterministic scheduling figures for one batch, all times in hours.
+
+    equipment is indexed by equipment name and sorted by occupancy (longest first):
+    operations, busy (time with an operation running), occupancy (first start to last end
+    of its operations, SuperPro's equipment occupancy per batch), idle_in_batch and gaps
+    (idle time and number of idle intervals within the occupancy), longest_gap, utilization
+    (occupancy per cycle time) and idle_per_cycle.
+
+    batch_time runs from the first start to the last end of the batch and is None when the
+    export has no start times. min_batch_spacing is the occupancy of the bottleneck
+    equipment, the shortest possible time between consecutive batch starts. cycle_time is
+    the actual time between batch starts (annual operating time / batches per year) when
+    both parameters are known, otherwise the minimum spacing.
+
+    Figures resting on an assumption are estimates: occupancy when operations have no start
+    time (untimed_operations) or were left out because their times couldn't be parsed
+    (incomplete_operations), and cycle time with utilization and idle_per_cycle when it
+    falls back to the minimum spacing. When the start and end times span longer than a
+    batch can run (ignored_timestamp_span, in hours), they are ignored and the operations
+    counted as untimed.
+    """
+    equipment: pd.DataFrame
+    batch_time: Optional[float]
+    bottleneck: Optional[str]
+    min_batch_spacing: float
+    cycle_time: float
+    annual_operating_time: Optional[float]
+    batches_per_year: Optional[float]
+    max_batches_per_year: Optional[float]
+    timed: bool
+    untimed_operations: int = 0
+    incomplete_operations: int = 0
+    cycle_time_estimated: bool = False
+    ignored_timestamp_span: Optional[float] = None
+
+    @property
+    def occupancy_estimated(self) -> bool:
+        return bool(self.untimed_operations or self.incomplete_operations)
+
+    def summary_table(self) -> pd.DataFrame:
+        """Key figures as a metric/value/basis table.
+
+        basis is 'parameter' for process parameters read from the export, 'computed' for
+        figures computed from the parsed tables and 'estimate' for those resting on an assumption.
+        """
+        occupancy = 'estimate' if self.occupancy_estimated else 'computed'
+        cycle = 'estimate' if self.cycle_time_estimated else 'parameter'
+        rows = [
+            ('Scheduling bottleneck', self.bottleneck or 'n/a', occupancy),
+            ('Bottleneck occupancy / minimum batch spacing (h)', self.min_batch_spacing, occupancy),
+            ('Cycle time (h)', self.cycle_time, cycle),
+            ('Batch time (h)', self.batch_time if self.batch_time is not None else 'n/a',
+             'estimate' if self.incomplete_operations else 'computed'),
+            ('Annual operating time (h)',
+             self.annual_operating_time if self.annual_operating_time is not None else 'n/a', 'parameter'),
+            ('Batches per year', self.batches_per_year if self.batches_per_year is not None else 'n/a', 'parameter'),
+            ('Maximum batches per year', self.max_batches_per_year if self.max_batches_per_year is not None else 'n/a',
+             occupancy),
+            ('Equipment items', len(self.equipment), 'computed'),
+        ]
+        return pd.DataFrame([(metric, round(value, 2) if isinstance(value, float) else value, basis)
+                             for metric, value, basis in rows], columns=['metric', 'value', 'basis'])
+
+    def to_prompt_section(self, max_rows: int = PROMPT_EQUIPMENT_ROWS) -> str:
+        """Text section giving the computed figures to the LLM, exact ones as ground truth"""
+        lines = ['Computed Schedule Metrics (figures with basis "parameter" or "computed" are exact; use them as '
+                 'given instead of estimating them. Figures with basis "estimate" rest on the assumptions below; '
+                 'say so when you use them)']
+        lines.append(format_table(self.summary_table()))
+        if self.ignored_timestamp_span is not None:
+            lines.append(f"The start and end times span {self.ignored_timestamp_span:.0f} h, longer than a batch "
+                         f"can run, so they were ignored as misread and operations are assumed to run back to back "
+                         f"in their equipment")
+        elif not self.timed and len(self.equipment):
+            lines.append('The export has no start times, so operations are assumed to run back to back '
+                         'in their equipment')
+        elif self.untimed_operations:
+            lines.append('Operations without a start time are assumed to run back to back after the timed '
+                         'ones of their equipment')
+        if self.incomplete_operations:
+            lines.append(f"{self.incomplete_operations} operations whose times could not be parsed are left out, "
+                         f"so occupancy figures are lower bounds")
+        if self.cycle_time_estimated:
+            lines.append('The annual operating time or batches per year could not be read, so the cycle time is '
+                         'assumed to be the minimum batch spacing, and utilization and idle_per_cycle are '
+                         'relative to it')
+        if len(self.equipment):
+            shown = self.equipment.head(max_rows)
+            lines.append('')
+            lines.append('Equipment occupancy per batch (h, longest first)')
+            lines.append(format_table(shown.reset_index()))
+            if len(self.equipment) > len(shown):
+                lines.append(f"... {len(self.equipment) - len(shown)} more equipment items with shorter occupancy")
+        return '\n'.join(lines)
+
+def _occupancy(codes: np.ndarray, starts: np.ndarray, ends: np.ndarray, count: int):
+    """Busy time, occupancy, idle gaps and longest gap per equipment code from operation intervals.
+
+    Intervals are sorted by equipment and start. Each equipment's ends are shifted past the
+    previous equipment's range, so a single running maximum gives the end of the busy block
+    so far within every equipment; an interval starting after it opens a new block.
+    """
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    shift = codes * (ends.max() - starts.min() + 1.0)
+    block_end = np.maximum.accumulate(ends + shift) - shift
+
+    same_equipment = codes[1:] == codes[:-1]
+    new_block = np.r_[True, ~same_equipment | (starts[1:] > block_end[:-1])]
+    gap = np.r_[0.0, np.where(same_equipment, starts[1:] - block_end[:-1], 0.0)].clip(min=0.0)
+
+    blocks = np.flatnonzero(new_block)
+    block_codes = codes[blocks]
+    busy = np.bincount(block_codes, weights=np.maximum.reduceat(ends, blocks) - starts[blocks], minlength=count)
+
+    groups = np.flatnonzero(np.r_[True, ~same_equipment])
+    group_codes = codes[groups]
+    occupancy = np.zeros(count)
+    occupancy[group_codes] = np.maximum.reduceat(ends, groups) - starts[groups]
+    gaps = np.bincount(block_codes, minlength=count) - np.isin(np.arange(count), group_codes)
+    longest_gap = np.zeros(count)
+    longest_gap[group_codes] = np.maximum.reduceat(gap, groups)
+    return busy, occupancy, gaps, longest_gap, starts.min(), ends.max()
+
+def compute_schedule_metrics(schedule: SchedulingData) -> ScheduleMetrics:
+    """Compute equipment occupancy, idle gaps, bottleneck, batch spacing and cycle time of a schedule.
+
+    An operation occupies its equipment from its start for its total time (setup, process
+    and turnaround) or until its end, whichever is later. Operations without a start time
+    are counted as running back to back after the timed ones of their equipment. Operations
+    whose times couldn't be parsed are left out and make the occupancy an estimate.
+    Start and end times spanning longer than the annual operating time (at most a year)
+    are ignored.
+    """
+    ops = schedule.operations.dropna(subset=['equipment'])
+    annual_time = schedule.numeric_parameter('annual operating time')
+    batches = schedule.numeric_parameter('batches per year')
+    span = pd.concat([ops['end'], ops['start'] + ops['total']]).max() - ops['start'].min()
+    ignored_span = None
+    if span > min(annual_time or HOURS_PER_YEAR, HOURS_PER_YEAR):
+        ignored_span = float(span)
+        ops = ops.assign(start=np.nan, end=np.nan)
+    # Without a readable total, an operation's extent is only known from its start and end
+    complete = ops['total'].notna() | ops[['start', 'end']].notna().all(axis=1)
+    incomplete = int((~complete).sum())
+    ops = ops[complete]
+    codes, names = pd.factorize(ops['equipment'])
+    count = len(names)
+    totals = ops['total'].fillna(0.0).to_numpy(dtype=float)
+    starts = ops['start'].to_numpy(dtype=float)
+    ends = np.fmax(ops['end'].to_numpy(dtype=float), starts + totals)
+    timed = ~np.isnan(starts)
+
+    busy, occupancy = np.zeros(count), np.zeros(count)
+    gaps, longest_gap = np.zeros(count, dtype=int), np.zeros(count)
+    batch_time = None
+    if timed.any():
+        busy, occupancy, gaps, longest_gap, first, last = _occupancy(codes[timed], starts[timed], ends[timed], count)
+        batch_time = float(last - first)
+    untimed = np.bincount(codes[~timed], weights=totals[~timed], minlength=count)
+    busy, occupancy = busy + untimed, occupancy + untimed
+
+    equipment = pd.DataFrame({
+        'operations': np.bincount(codes, minlength=count),
+        'busy': busy,
+        'occupancy': occupancy,
+        'idle_in_batch': occupancy - busy,
+        'gaps': gaps,
+        'longest_gap': longest_gap,
+    }, index=pd.Index(names, name='equipment'))
+    equipment = equipment.sort_values('occupancy', ascending=False, kind='stable')
+
+    bottleneck = equipment.index[0] if count else None
+    min_batch_spacing = float(equipment['occupancy'].iloc[0]) if count else 0.0
+    cycle_time_estimated = not (annual_time and batches)
+    cycle_time = min_batch_spacing if cycle_time_estimated else annual_time / batches
+    if cycle_time:
+        equipment['utilization'] = equipment['occupancy'] / cycle_time
+        equipment['idle_per_cycle'] = cycle_time - equipment['occupancy']
+    else:
+        equipment['utilization'] = equipment['idle_per_cycle'] = np.nan
+    max_batches = annual_time / min_batch_spacing if annual_time and min_batch_spacing else None
+
+    return ScheduleMetrics(equipment, batch_time, bottleneck, min_batch_spacing, cycle_time,
+                           annual_time, batches, max_batches, bool(timed.any()),
+                           untimed_operations=int((~timed).sum()), incomplete_operations=incomplete,
+                           cycle_time_estimated=cycle_time_estimated, ignored_timestamp_span=ignored_span)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python scheduling_metrics.py <scheduling_export>")
+        sys.exit(1)
+    print(compute_schedule_metrics(parse_scheduling_file(sys.argv[1])).to_prompt_section())
@@ -0,0 +1,356 @@
+import codecs
+import io
+import itertools
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Header keywords of the known columns, checked in order against the lowercase header cell
+COLUMN_KEYWORDS = [
+    ('operating_mode', ('operating mode', 'mode')),
+    ('procedure', ('procedure',)),
+    ('operation', ('operation', 'task')),
+    ('equipment', ('equipment', 'resource')),
+    ('setup', ('setup', 'set-up')),
+    ('turnaround', ('turnaround', 'turnover')),
+    ('process', ('process',)),
+    ('duration', ('duration',)),
+    ('start', ('start',)),
+    ('end', ('finish', 'end')),
+]
+DURATION_COLUMNS = ['setup', 'process', 'turnaround', 'duration']
+CLOCK_COLUMNS = ['start', 'end']
+# Numbers with optional thousands separators and decimals: "7920", "7.920", "10.086,52", "1,200.5"
+NUMBER_PATTERN = r'-?(?:\d{1,3}(?:[.,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)'
+# Durations such as "1,5 h", "90 min", "7.920 h" or "0.25"; bare numbers are hours
+DURATION_PATTERN = rf'^({NUMBER_PATTERN})\s*(h|hr|hrs|hour|hours|min|mins|minutes|s|sec|day|days)?\.?$'
+UNIT_HOURS = {'': 1.0, 'h': 1.0, 'hr': 1.0, 'hrs': 1.0, 'hour': 1.0, 'hours': 1.0,
+              'min': 1 / 60, 'mins': 1 / 60, 'minutes': 1 / 60, 's': 1 / 3600, 'sec': 1 / 3600,
+              'day': 24.0, 'days': 24.0}
+# Section titles of procedure tables, e.g. "Procedure P-3 in V-101"
+PROCEDURE_TITLE = re.compile(r'(?P<procedure>[A-Za-z]+-\d+)(?:\s+in\s+(?P<equipment>[^\s(]+))?')
+# Cells holding a value rather than a column name
+VALUE_CELL = re.compile(r'^-?\d+(?:[.,:/]\d+)*\s*\S{0,5}$')
+# Leading number of a cell, used to detect the export's number format
+LEADING_NUMBER = re.compile(r'^-?(\d[\d.,]*\d)')
+# Dates with day and month first in either order, e.g. "12/02/2024 22:00" or "12.02.2024"
+NUMERIC_DATE = r'^\s*(\d{1,2})([./-])(\d{1,2})\2\d{2,4}\b'
+
+def _header_columns(cells: List[str]) -> Optional[Dict[int, str]]:
+    """Map cell positions to known columns if the row is a table header"""
+    if any(VALUE_CELL.match(cell) for cell in cells if cell):
+        return None
+    columns = {}
+    for index, cell in enumerate(cells):
+        text = cell.lower()
+        for name, keywords in COLUMN_KEYWORDS:
+            if name not in columns.values() and any(keyword in text for keyword in keywords):
+                columns[index] = name
+                break
+    return columns if len(columns) >= 2 else None
+
+def _separator_role(number: str, separator: str) -> Optional[str]:
+    """'thousands' or 'decimal' if the separator's use in a number is unambiguous, else None"""
+    groups = number.split(separator)[1:]
+    if len(groups) > 1:
+        return 'thousands' if all(len(group) == 3 for group in groups) else None
+    return 'decimal' if groups and len(groups[0]) != 3 else None
+
+def detect_number_format(values: Iterable[str]) -> str:
+    """Detect number formatting style: 'EU' for European format and 'US' for American format.
+
+    Same heuristic as ProcessDataExtractor._detect_number_format: the first number with both
+    '.' and ',' decides by which comes first. Numbers with a single kind of separator decide
+    when its role is unambiguous: repeated in groups of three digits ("41.380.000") it
+    separates thousands, followed by other than three digits ("1,5") it is the decimal point.
+    """
+    for value in values:
+        match = LEADING_NUMBER.match(value.strip())
+        if not match:
+            continue
+        number = match.group(1)
+        if '.' in number and ',' in number:
+            return 'EU' if number.find('.') < number.find(',') else 'US'
+        for separator, decimal_format in (('.', 'US'), (',', 'EU')):
+            role = _separator_role(number, separator) if separator in number else None
+            if role == 'decimal':
+                return decimal_format
+            if role == 'thousands':
+                return 'EU' if decimal_format == 'US' else 'US'
+    return 'US'
+
+def _to_number(values: pd.Series, number_format: str) -> pd.Series:
+    """Convert number text to floats, removing the thousands separators of the number format"""
+    if number_format == 'EU':
+        values = values.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    else:
+        values = values.str.replace(',', '', regex=False)
+    return pd.to_numeric(values, errors='coerce')
+
+def _duration_hours(values: pd.Series, number_format: str = 'US') -> pd.Series:
+    """Convert duration text ("1,5 h", "90 min", "2") to hours, NaN where it isn't one"""
+    parts = values.str.strip().str.lower().str.extract(DURATION_PATTERN)
+    numbers = _to_number(parts[0], number_format)
+    return (numbers * parts[1].fillna('').map(UNIT_HOURS)).astype(float)
+
+def _day_first(values: pd.Series, number_format: str) -> bool:
+    """Whether the numeric dates among values put the day first, decided once for all of them.
+
+    A first field above 12 means day first, a second field above 12 month first; without
+    such a date, dotted dates and EU exports are taken as day first.
+    """
+    parts = values.str.extract(NUMERIC_DATE).dropna()
+    if parts.empty:
+        return number_format == 'EU'
+    first, second = parts[0].astype(int), parts[2].astype(int)
+    if (first > 12).any():
+        return True
+    if (second > 12).any():
+        return False
+    return (parts[1] == '.').any() or number_format == 'EU'
+
+def _parse_dates(values: pd.Series, day_first: bool) -> pd.Series:
+    """Parse dates with one day/month order for all numeric dates; ISO and named-month dates are unaffected"""
+    numeric = values.str.match(NUMERIC_DATE, na=False)
+    dates = pd.to_datetime(values.where(~numeric), errors='coerce', format='mixed')
+    if numeric.any():
+        dates[numeric] = pd.to_datetime(values[numeric], errors='coerce', format='mixed', dayfirst=day_first)
+    return dates
+
+def _clock_hours(columns: List[pd.Series], number_format: str = 'US') -> List[pd.Series]:
+    """Convert start/end times to hours; dates and times of day count from the earliest of all of them"""
+    hours = [_duration_hours(values, number_format) for values in columns]
+    texts = [values.where(h.isna() & values.str.strip().ne('')) for values, h in zip(columns, hours)]
+    day_first = _day_first(pd.concat(texts), number_format)
+    dates = [_parse_dates(values, day_first) for values in texts]
+    found = [d.dropna() for d in dates]
+    if any(len(d) for d in found):
+        origin = min(d.min() for d in found if len(d))
+        hours = [h.fillna((d - origin).dt.total_seconds() / 3600) for h, d in zip(hours, dates)]
+    return hours
+
+def _format_value(value) -> str:
+    if isinstance(value, (float, np.floating)):
+        return '' if np.isnan(value) else f"{value:.2f}".rstrip('0').rstrip('.')
+    return str(value)
+
+def format_table(df: pd.DataFrame) -> str:
+    """Tab-separated table with hours rounded to 0.01 and empty cells for missing values"""
+    rows = ['\t'.join(map(_format_value, row)) for row in df.itertuples(index=False)]
+    return '\n'.join(['\t'.join(df.columns)] + rows)
+
+@dataclass
+class SchedulingData:
+    """Typed tables parsed from a SuperPro scheduling export.
+
+    operations has one row per operation with its procedure, equipment and times in hours:
+    setup, process, turnaround, their total, and start/end when the export has them (NaN
+    otherwise). procedures and equipment are indexed by name, durations sums the operation
+    times per procedure. Sections that weren't recognized are kept as raw text.
+
+    Times whose cells couldn't be read stay NaN, as do the totals they are part of, and the
+    cells are listed in unparsed (procedure, operation, column, value). number_format is
+    'US' or 'EU', as detected from the export's numbers.
+    """
+    parameters: Dict[str, str]
+    procedures: pd.DataFrame
+    operations: pd.DataFrame
+    equipment: pd.DataFrame
+    durations: pd.DataFrame
+    other_sections: List[str] = field(default_factory=list)
+    unparsed: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=['procedure', 'operation', 'column', 'value']))
+    number_format: str = 'US'
+
+    def numeric_parameter(self, keyword: str) -> Optional[float]:
+        """Value of the first process parameter whose name contains keyword, in hours for durations"""
+        for name, value in self.parameters.items():
+            if keyword.lower() in name.lower():
+                number = _duration_hours(pd.Series([value]), self.number_format).iloc[0]
+                return None if np.isnan(number) else float(number)
+        return None
+
+    def to_prompt_sections(self) -> List[str]:
+        """Compact text sections for the LLM: parameters, overview tables, then one table per procedure"""
+        sections = []
+        if self.parameters:
+            sections.append('Process Parameters\n' + '\n'.join(f"{key}\t{value}" for key, value in self.parameters.items()))
+        if len(self.procedures):
+            overview = self.procedures.join(self.durations).fillna({'operations': 0}).astype({'operations': int})
+            sections.append('Procedures (times in h per batch)\n' + format_table(overview.reset_index()))
+        if len(self.equipment):
+            equipment = self.equipment.assign(procedures=self.equipment['procedures'].str.count(', ') + 1)
+            sections.append('Equipment (times in h per batch)\n' + format_table(equipment.reset_index()))
+        columns = ['operation'] + [name for name in ('setup', 'process', 'turnaround', 'start', 'end')
+                                   if self.operations[name].notna().any()]
+        for (procedure, equipment), ops in self.operations.groupby(['procedure', 'equipment'], sort=False, dropna=False):
+            title = f"Operations of {procedure}" + (f" in {equipment}" if isinstance(equipment, str) else '')
+            sections.append(f"{title} (h)\n" + format_table(ops[columns]))
+        if len(self.unparsed):
+            sections.append('Values that could not be parsed (left unknown, as are the totals they are part of)\n'
+                            + format_table(self.unparsed))
+        return sections + self.other_sections
+
+class _ExportParser:
+    """Single pass over the export lines, keeping only the current section's raw lines"""
+
+    def __init__(self):
+        self.parameters = {}
+        self.overview_rows = []  # (procedure, operating_mode, equipment)
+        self.operation_rows = []  # (procedure, equipment, operation, *DURATION_COLUMNS, *CLOCK_COLUMNS)
+        self.other_sections = []
+        self._start_section()
+
+    def _start_section(self, title: str = ''):
+        self.title = title
+        self.columns = None
+        self.raw_lines = []
+        self.recognized = False
+        match = PROCEDURE_TITLE.search(title)
+        # Other titles (e.g. "Task List") leave the procedure to the rows
+        self.title_procedure = match.group('procedure') if match else ''
+        self.title_equipment = match.group('equipment') or '' if match else ''
+
+    def _end_section(self):
+        if self.raw_lines and not self.recognized:
+            self.other_sections.append('\n'.join(self.raw_lines))
+        self._start_section()
+
+    def feed(self, line: str):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            self._end_section()
+            return
+        if '****' in line:  # Section separator, possibly with the section title
+            self._end_section()
+            self._start_section(line.replace('*', '').strip())
+            self.raw_lines.append(line)
+            return
+
+        raw_cells = [cell.strip() for cell in line.split('\t')]
+        cells = [cell for cell in raw_cells if cell]
+        if not self.raw_lines and not self.title and len(cells) == 1:
+            self._start_section(cells[0])  # Title line of a section without separator
+        self.raw_lines.append(line)
+
+        header = _header_columns(raw_cells)
+        if header is not None:
+            self.columns = header  # Also skips headers repeated inside a table
+        elif self.columns is not None:
+            self._add_table_row(raw_cells)
+        elif len(cells) == 2 and 'parameter' in self.title.lower():
+            self.parameters[cells[0]] = cells[1]
+            self.recognized = True
+
+    def _add_table_row(self, cells: List[str]):
+        row = {name: cells[index] for index, name in self.columns.items() if index < len(cells)}
+        if row.get('operation') and any(row.get(name) for name in DURATION_COLUMNS + CLOCK_COLUMNS):
+            procedure = row.get('procedure') or self.title_procedure
+            if not procedure:  # Flat task lists name the procedure in the task, e.g. "P-1: Charge"
+                match = PROCEDURE_TITLE.match(row['operation'])
+                procedure = match.group('procedure') if match else ''
+            self.operation_rows.append((
+                procedure, row.get('equipment') or self.title_equipment,
+                row['operation'], *(row.get(name, '') for name in DURATION_COLUMNS + CLOCK_COLUMNS)))
+            self.recognized = True
+        elif row.get('procedure') and 'operation' not in self.columns.values():
+            self.overview_rows.append((row['procedure'], row.get('operating_mode', ''), row.get('equipment', '')))
+            self.recognized = True
+
+    def finish(self) -> SchedulingData:
+        self._end_section()
+        columns = ['procedure', 'equipment', 'operation'] + DURATION_COLUMNS + CLOCK_COLUMNS
+        raw = pd.DataFrame(self.operation_rows, columns=columns, dtype=object).astype(str)
+        values = raw[DURATION_COLUMNS + CLOCK_COLUMNS]
+        number_format = detect_number_format(itertools.chain(
+            self.parameters.values(), pd.unique(values.to_numpy().ravel())))
+        operations = raw.copy()
+        for name in DURATION_COLUMNS:
+            operations[name] = _duration_hours(raw[name], number_format)
+        operations['start'], operations['end'] = _clock_hours([raw['start'], raw['end']], number_format)
+        # Cells with text that isn't a time; their times stay unknown instead of counting as zero
+        unreadable = values.apply(lambda column: column.str.strip().ne('')) & operations[values.columns].isna()
+        unparsed = unreadable.stack()
+        unparsed = unparsed[unparsed].index
+        unparsed = pd.DataFrame({
+            'procedure': raw['procedure'].to_numpy()[unparsed.get_level_values(0)],
+            'operation': raw['operation'].to_numpy()[unparsed.get_level_values(0)],
+            'column': unparsed.get_level_values(1),
+            'value': values.stack()[unparsed].to_numpy(),
+        })
+        # Missing process times come from the duration, or from start and end
+        operations['process'] = operations['process'].fillna(operations['duration']).fillna(
+            operations['end'] - operations['start'])
+        operations = operations.drop(columns='duration')
+
+        # Procedures from the overview table, completed with those only found in operation tables
+        procedures = pd.DataFrame(self.overview_rows, columns=['procedure', 'operating_mode', 'equipment'])
+        procedures = procedures.drop_duplicates('procedure').set_index('procedure').replace('', np.nan)
+        operations['equipment'] = operations['equipment'].replace('', np.nan)
+        known = operations.dropna(subset=['equipment']).groupby('procedure', sort=False)['equipment'].first()
+        procedures = procedures.reindex(procedures.index.union(known.index, sort=False))
+        procedures['equipment'] = procedures['equipment'].fillna(known)
+        procedures.index.name = 'procedure'
+        # Operations listed without equipment run in their procedure's equipment
+        operations['equipment'] = operations['equipment'].fillna(operations['procedure'].map(procedures['equipment']))
+
+        # Times without a cell are zero; unreadable ones stay NaN, and so do the totals including them
+        unknown = pd.DataFrame({
+            'setup': unreadable['setup'],
+            'process': unreadable[['process', 'duration', 'start', 'end']].any(axis=1),
+            'turnaround': unreadable['turnaround'],
+        })
+        times = operations[['setup', 'process', 'turnaround']]
+        times = times.mask(times.isna() & ~unknown, 0.0)
+        operations[times.columns] = times
+        operations.insert(6, 'total', times.sum(axis=1, skipna=False))
+        times = times.assign(total=operations['total'])
+        by_procedure = operations['procedure']
+        durations = times.groupby(by_procedure, sort=False).sum().mask(
+            times.isna().groupby(by_procedure, sort=False).any())
+        durations.insert(0, 'operations', operations.groupby('procedure', sort=False).size())
+
+        assigned = procedures.dropna(subset=['equipment'])
+        by_equipment = assigned['equipment']
+        equipment = pd.DataFrame({
+            'procedures': assigned.index.to_series().groupby(by_equipment, sort=False).agg(', '.join),
+            'total': durations['total'].groupby(by_equipment).sum(),
+        }).fillna({'total': 0.0})
+        incomplete = durations['total'].isna().groupby(by_equipment).any()
+        equipment['total'] = equipment['total'].mask(incomplete.reindex(equipment.index, fill_value=False))
+        equipment.index.name = 'equipment'
+
+        return SchedulingData(self.parameters, procedures, operations, equipment, durations, self.other_sections,
+                              unparsed, number_format)
+
+def parse_scheduling_lines(lines: Iterable[str]) -> SchedulingData:
+    """Parse the lines of a scheduling export in one pass"""
+    parser = _ExportParser()
+    for line in lines:
+        parser.feed(line)
+    return parser.finish()
+
+def parse_scheduling_file(file) -> SchedulingData:
+    """Parse a scheduling export from a path, bytes or a binary file-like object (e.g. a Streamlit upload).
+
+    The content is decoded incrementally line by line, so the export is never decoded,
+    split or copied as a whole.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            return parse_scheduling_file(handle)
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    file.seek(0)
+    return parse_scheduling_lines(codecs.iterdecode(file, 'utf-8', errors='replace'))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python scheduling_parser.py <scheduling_export>")
+        sys.exit(1)
+    print('\n\n'.join(parse_scheduling_file(sys.argv[1]).to_prompt_sections()))
@@ -0,0 +1,24 @@
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chart_generation_multiple as charts
+
+def square_or_crash(value):
+    """Worker job; 0 kills the worker process as an out-of-memory kill would"""
+    if value == 0:
+        os._exit(1)
+    return value * value
+
+def test_worker_crash_fails_only_its_job():
+    futures = charts._run_in_pool(square_or_crash, [(2,), (0,), (3,), (4,)], limit=1)
+    assert futures[0].result() == 4
+    with pytest.raises(BrokenProcessPool):
+        futures[1].result()
+    assert [future.result() for future in futures[2:]] == [9, 16]
+    # Later calls use the replacement pool
+    assert charts._run_in_pool(square_or_crash, [(5,)], limit=1)[0].result() == 25
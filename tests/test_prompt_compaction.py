@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.prompt_compaction import chunk_sections, compact_table_text, estimate_tokens
+
+def table_section(title, rows):
+    return '\n'.join([title, 'operation\tsetup\tprocess'] + [f"OP-{i}\t0.5\t{i}" for i in range(rows)])
+
+def test_small_sections_are_packed_whole():
+    sections = [table_section(f"Operations of P-{i} (h)", 3) for i in range(4)]
+    chunks = chunk_sections(sections, 1000, header_lines=2)
+    assert chunks == ['\n\n'.join(sections)]
+
+def test_split_section_repeats_title_and_header():
+    section = table_section('Operations of P-1 in V-101 (h)', 200)
+    chunks = chunk_sections(['Process Parameters\nBatches per Year\t100', section], 300, header_lines=2)
+    assert len(chunks) > 2
+    assert chunks[0].startswith('Process Parameters\nBatches per Year\t100\n\nOperations of P-1 in V-101 (h)\n')
+    for chunk in chunks[1:]:
+        assert chunk.startswith('Operations of P-1 in V-101 (h) (continued)\noperation\tsetup\tprocess\nOP-')
+        assert estimate_tokens(chunk) <= 300
+    rows = [line for chunk in chunks for line in chunk.split('\n') if line.startswith('OP-')]
+    assert rows == section.split('\n')[2:]
+
+def test_split_section_without_header_lines():
+    section = table_section('Operations of P-1 (h)', 200)
+    chunks = chunk_sections([section], 300)
+    assert '\n'.join(chunks) == section
+
+def report_text(sections, rows):
+    lines = []
+    for section in range(sections):
+        lines.append(f"{section + 1}. MATERIALS COST - SECTION {section}")
+        lines += [f"Material {row}\t{row * 1234.5:.2f}\t{row % 7}" for row in range(rows)]
+        lines.append(f"TOTAL\t{rows * 999.5:.2f}")
+    return '\n'.join(lines)
+
+def test_compaction_stays_within_budget():
+    text = report_text(4, 60)
+    for max_tokens in (30, 100, 300, 1000):
+        compacted = compact_table_text(text, max_tokens=max_tokens)
+        assert compacted.tokens <= max_tokens
+        assert compacted.tokens == estimate_tokens(compacted.text)
+
+def test_shortened_section_keeps_totals_and_notes_omission():
+    compacted = compact_table_text(report_text(1, 200), max_tokens=300)
+    lines = compacted.text.split('\n')
+    assert lines[0] == '1. MATERIALS COST - SECTION 0'
+    assert lines[-1].startswith('TOTAL')
+    assert lines[-2] == f"... {compacted.omitted_rows} more rows omitted"
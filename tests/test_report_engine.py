@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.report_engine import ReportSection, generate_sections
+
+class StubServer:
+    """OpenAI-compatible chat completions endpoint answering "<prompt> done" after a delay.
+
+    Records the order in which requests start and finish, the peak number in flight and
+    the requests that were cancelled. Prompts listed in fail get a 400 response.
+    """
+
+    def __init__(self, delays, fail=()):
+        self.delays = delays
+        self.fail = set(fail)
+        self.events = []
+        self.cancelled = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        prompt = body['messages'][0]['content']
+        self.events.append(('start', prompt))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(prompt, 0.01))
+        except asyncio.CancelledError:
+            self.cancelled.append(prompt)
+            raise
+        finally:
+            self.in_flight -= 1
+        self.events.append(('end', prompt))
+        if prompt in self.fail:
+            return httpx.Response(400, json={'error': {'message': f"{prompt} failed"}})
+        return httpx.Response(200, json={
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': f"{prompt} done"}}],
+        })
+
+    def client(self) -> openai.AsyncOpenAI:
+        return openai.AsyncOpenAI(base_url='http://stub/v1', api_key='test', max_retries=0,
+                                  http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle)))
+
+def report_sections(client):
+    """Sections of the Techno-Economic report: discussion builds on technical and results"""
+    return [
+        ReportSection('technical', client, 'stub-model', 'technical'),
+        ReportSection('results', client, 'stub-model', 'results'),
+        ReportSection('discussion', client, 'stub-model',
+                      lambda context: f"discussion of {context['technical']} and {context['results']}",
+                      depends_on=('technical', 'results')),
+        ReportSection('summary', client, 'stub-model', 'summary'),
+    ]
+
+def test_dependent_section_waits_for_its_dependencies():
+    server = StubServer({'technical': 0.05, 'results': 0.1})
+    texts = asyncio.run(generate_sections(report_sections(server.client())))
+
+    discussion = 'discussion of technical done and results done'
+    assert texts == {'technical': 'technical done', 'results': 'results done',
+                     'discussion': f"{discussion} done", 'summary': 'summary done'}
+    starts = server.events.index(('start', discussion))
+    assert ('end', 'technical') in server.events[:starts] and ('end', 'results') in server.events[:starts]
+    # Independent sections run concurrently instead of one after the other
+    assert server.peak == 3
+
+def test_max_concurrency_limits_requests_in_flight():
+    server = StubServer({})
+    client = server.client()
+    sections = [ReportSection(f"part_{i}", client, 'stub-model', f"part {i}") for i in range(8)]
+    texts = asyncio.run(generate_sections(sections, max_concurrency=2))
+
+    assert len(texts) == 8
+    assert server.peak == 2
+
+def test_failing_section_cancels_running_sections():
+    server = StubServer({'results': 0.01, 'technical': 1.0, 'summary': 1.0}, fail={'results'})
+
+    async def run():
+        with pytest.raises(openai.BadRequestError):
+            await generate_sections(report_sections(server.client()))
+        await asyncio.sleep(0.05)  # Let the cancellations reach the requests, well before they would finish
+        assert sorted(server.cancelled) == ['summary', 'technical']
+
+    asyncio.run(run())
+    assert not any(prompt.startswith('discussion') for _, prompt in server.events)
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling_metrics import compute_schedule_metrics
+from scheduling_parser import parse_scheduling_lines
+
+def schedule_lines(annual_time, batches, rows):
+    """Scheduling export with process parameters and one timed procedure table"""
+    lines = ['**** Process Parameters ****', f"Annual Operating Time\t{annual_time}",
+             f"Number of Batches per Year\t{batches}", '',
+             '**** Procedure P-1 in V-101 ****', 'Operation\tProcess\tStart']
+    return lines + ['\t'.join(row) for row in rows]
+
+def basis(metrics, metric):
+    table = metrics.summary_table().set_index('metric')
+    return table.loc[metric, 'basis']
+
+@pytest.mark.parametrize('annual_time, batches', [('7,920 h', '1,000'), ('7.920,00 h', '1.000')])
+def test_cycle_time_from_parameters(annual_time, batches):
+    metrics = compute_schedule_metrics(parse_scheduling_lines(schedule_lines(annual_time, batches, [
+        ('Charge', '2', '0'), ('React', '3', '4')])))
+    assert metrics.cycle_time == pytest.approx(7.92)
+    assert not metrics.cycle_time_estimated and not metrics.occupancy_estimated
+    assert metrics.equipment.loc['V-101', 'utilization'] == pytest.approx(7 / 7.92)
+    assert basis(metrics, 'Cycle time (h)') == 'parameter'
+    assert basis(metrics, 'Bottleneck occupancy / minimum batch spacing (h)') == 'computed'
+    assert 'basis "estimate"' in metrics.to_prompt_section()
+
+def test_cycle_time_fallback_is_an_estimate():
+    metrics = compute_schedule_metrics(parse_scheduling_lines(schedule_lines('n/a', 'n/a', [
+        ('Charge', '2', '0'), ('React', '3', '4')])))
+    assert metrics.cycle_time == metrics.min_batch_spacing == 7.0
+    assert metrics.cycle_time_estimated
+    assert basis(metrics, 'Cycle time (h)') == 'estimate'
+    assert 'cycle time is assumed' in metrics.to_prompt_section()
+
+def test_unparsed_operations_make_occupancy_an_estimate():
+    metrics = compute_schedule_metrics(parse_scheduling_lines(schedule_lines('7920 h', '1000', [
+        ('Charge', '2', '0'), ('React', 'long', '4')])))
+    assert metrics.incomplete_operations == 1
+    assert metrics.min_batch_spacing == 2.0
+    assert basis(metrics, 'Scheduling bottleneck') == 'estimate'
+    assert 'lower bounds' in metrics.to_prompt_section()
+
+@pytest.mark.parametrize('starts, ends', [
+    (['02/12/2024 22:00', '02/13/2024 00:00'], ['02/13/2024 01:30', '02/13/2024 04:00']),
+    (['12/02/2024 22:00', '13/02/2024 00:00'], ['13/02/2024 01:30', '13/02/2024 04:00']),
+])
+def test_timestamped_schedule(starts, ends):
+    lines = ['**** Process Parameters ****', 'Annual Operating Time\t7920 h', 'Number of Batches per Year\t1000', '',
+             '**** Procedure P-1 in V-101 ****', 'Operation\tStart\tFinish']
+    lines += [f"OP-{i}\t{start}\t{end}" for i, (start, end) in enumerate(zip(starts, ends))]
+    metrics = compute_schedule_metrics(parse_scheduling_lines(lines))
+    assert metrics.batch_time == 6.0
+    assert metrics.min_batch_spacing == 6.0
+    assert metrics.equipment.loc['V-101', 'busy'] == 6.0
+    assert metrics.ignored_timestamp_span is None
+    assert basis(metrics, 'Batch time (h)') == 'computed'
+
+def test_implausible_timestamp_span_is_ignored():
+    lines = ['**** Procedure P-1 in V-101 ****', 'Operation\tProcess\tStart\tFinish',
+             'Charge\t2\t01/02/2024 08:00\t01/02/2024 10:00', 'React\t3\t01/02/2025 08:00\t01/02/2025 11:00']
+    metrics = compute_schedule_metrics(parse_scheduling_lines(lines))
+    assert metrics.ignored_timestamp_span > 8760
+    assert metrics.batch_time is None
+    assert metrics.min_batch_spacing == 5.0
+    assert basis(metrics, 'Bottleneck occupancy / minimum batch spacing (h)') == 'estimate'
+    assert 'ignored as misread' in metrics.to_prompt_section()
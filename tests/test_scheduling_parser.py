@@ -0,0 +1,84 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling_parser import detect_number_format, parse_scheduling_lines
+
+def export_lines(annual_time, batches, rows):
+    """Minimal scheduling export with process parameters and one procedure table"""
+    lines = ['**** Process Parameters ****', f"Annual Operating Time\t{annual_time}",
+             f"Number of Batches per Year\t{batches}", '',
+             '**** Procedure P-1 in V-101 ****', 'Operation\tSetup\tProcess\tTurnaround']
+    return lines + ['\t'.join(row) for row in rows]
+
+@pytest.mark.parametrize('values, expected', [
+    (['10.086,52'], 'EU'),
+    (['1,200.5'], 'US'),
+    (['41.380.000'], 'EU'),
+    (['41,380,000'], 'US'),
+    (['1,5 h'], 'EU'),
+    (['0.25'], 'US'),
+    (['7.920 h', '1.200,5 min'], 'EU'),  # "7.920" alone is ambiguous
+    (['7.920 h', '01.02.2024', '100'], 'US'),
+])
+def test_detect_number_format(values, expected):
+    assert detect_number_format(values) == expected
+
+def test_us_export():
+    schedule = parse_scheduling_lines(export_lines('7,920 h', '1,000', [
+        ('Charge', '0.5', '1,200.5 min', '0.25'), ('React', '', '12', '')]))
+    assert schedule.number_format == 'US'
+    assert schedule.numeric_parameter('annual operating time') == 7920.0
+    assert schedule.numeric_parameter('batches per year') == 1000.0
+    assert schedule.operations['process'].tolist() == pytest.approx([1200.5 / 60, 12.0])
+    assert schedule.durations.loc['P-1', 'total'] == pytest.approx(0.75 + 1200.5 / 60 + 12.0)
+    assert schedule.unparsed.empty
+
+def test_eu_export():
+    schedule = parse_scheduling_lines(export_lines('7.920,00', '1.000', [
+        ('Charge', '0,5', '1.200,5 min', '0,25'), ('React', '', '12', '')]))
+    assert schedule.number_format == 'EU'
+    assert schedule.numeric_parameter('annual operating time') == 7920.0
+    assert schedule.numeric_parameter('batches per year') == 1000.0
+    assert schedule.operations['process'].tolist() == pytest.approx([1200.5 / 60, 12.0])
+    assert schedule.equipment.loc['V-101', 'total'] == pytest.approx(0.75 + 1200.5 / 60 + 12.0)
+
+def test_eu_thousands_without_decimals():
+    schedule = parse_scheduling_lines(export_lines('7.920 h', '100', [('Charge', '0,5', '2', '')]))
+    assert schedule.numeric_parameter('annual operating time') == 7920.0
+
+def test_unparsed_times_stay_unknown():
+    schedule = parse_scheduling_lines(export_lines('7920 h', '100', [
+        ('Charge', '0.5', 'about 2 h', ''), ('React', '', '12', '')]))
+    charge, react = schedule.operations.itertuples(index=False)
+    assert np.isnan(charge.process) and np.isnan(charge.total)
+    assert charge.turnaround == 0.0 and react.total == 12.0
+    assert np.isnan(schedule.durations.loc['P-1', 'total'])
+    assert np.isnan(schedule.equipment.loc['V-101', 'total'])
+    assert schedule.unparsed.values.tolist() == [['P-1', 'Charge', 'process', 'about 2 h']]
+    assert any(section.startswith('Values that could not be parsed') for section in schedule.to_prompt_sections())
+
+@pytest.mark.parametrize('starts, ends', [
+    (['12/02/2024 22:00', '13/02/2024 00:00'], ['13/02/2024 01:30', '13/02/2024 04:00']),  # EU, day first
+    (['02/12/2024 22:00', '02/13/2024 00:00'], ['02/13/2024 01:30', '02/13/2024 04:00']),  # US, month first
+    (['12.02.2024 22:00', '13.02.2024 00:00'], ['13.02.2024 01:30', '13.02.2024 04:00']),
+])
+def test_timestamps_use_one_day_month_order(starts, ends):
+    lines = ['**** Procedure P-1 in V-101 ****', 'Operation\tStart\tFinish']
+    lines += [f"OP-{i}\t{start}\t{end}" for i, (start, end) in enumerate(zip(starts, ends))]
+    operations = parse_scheduling_lines(lines).operations
+    assert operations['start'].tolist() == [0.0, 2.0]
+    assert operations['end'].tolist() == [3.5, 6.0]
+    assert operations['process'].tolist() == [3.5, 4.0]
+
+def test_titled_flat_task_list_takes_procedures_from_tasks():
+    schedule = parse_scheduling_lines([
+        '**** Task List ****', 'Task\tEquipment\tDuration',
+        'P-1: Charge\tV-101\t1 h', 'P-1: React\tV-101\t2 h', 'P-2: Filter\tF-101\t0,5 h'])
+    assert schedule.operations['procedure'].tolist() == ['P-1', 'P-1', 'P-2']
+    assert sorted(schedule.equipment.index) == ['F-101', 'V-101']
+    assert schedule.durations['total'].tolist() == [3.0, 0.5]
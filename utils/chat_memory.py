@@ -0,0 +1,94 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from utils.prompt_compaction import estimate_tokens
+
+# Recent messages kept verbatim, and the rolling summary of everything before them
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_TOKEN_BUDGET = 400
+# Compaction folds the recent messages down to this share of the budget, so it runs every few turns, not every turn
+COMPACT_TO = 0.5
+FIRST_SENTENCE = re.compile(r'^(.+?[.!?])(\s|$)', re.DOTALL)
+
+Message = Dict[str, str]
+# Builds the new summary from the previous one and the messages being folded into it
+Summarizer = Callable[[str, List[Message]], str]
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut the start of text at a word boundary so that it fits max_tokens; a rolling summary ends with the latest turns"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split(' ')
+    low, high = 1, len(words)
+    while low < high:  # Earliest word from which the rest fits the budget
+        middle = (low + high) // 2
+        if estimate_tokens('… ' + ' '.join(words[middle:])) <= max_tokens:
+            high = middle
+        else:
+            low = middle + 1
+    return '… ' + ' '.join(words[low:])
+
+def extractive_summary(summary: str, messages: List[Message]) -> str:
+    """Local summarizer: the earlier summary plus each question and the first sentence of its answer"""
+    lines = [summary] if summary else []
+    for message in messages:
+        content = ' '.join(message['content'].split())
+        if message['role'] == 'assistant':
+            match = FIRST_SENTENCE.match(content)
+            lines.append(f"Answer: {match.group(1) if match else content}")
+        else:
+            lines.append(f"Question: {content}")
+    return '\n'.join(lines)
+
+@dataclass
+class ChatMemory:
+    """Conversation memory of one chat session with a bounded size.
+
+    The latest messages are kept verbatim while they fit max_tokens; compact() folds the
+    older ones into a rolling summary of at most summary_tokens. The history sent with a
+    question therefore stays around max_tokens + summary_tokens, however long the session.
+    """
+    max_tokens: int = HISTORY_TOKEN_BUDGET
+    summary_tokens: int = SUMMARY_TOKEN_BUDGET
+    summary: str = ''
+    messages: List[Message] = field(default_factory=list)
+
+    def add(self, role: str, content: str):
+        self.messages.append({"role": role, "content": content})
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(m['content']) for m in self.messages)
+
+    def prompt_messages(self) -> List[Message]:
+        """History for the next request: the summary as a system message, then the recent messages"""
+        summary = [{"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"}] \
+            if self.summary else []
+        return summary + [dict(m) for m in self.messages]
+
+    def last_question(self) -> str:
+        return next((m['content'] for m in reversed(self.messages) if m['role'] == 'user'), '')
+
+    def compact(self, summarize: Summarizer = extractive_summary) -> bool:
+        """Fold the oldest messages into the summary once the recent ones exceed max_tokens.
+
+        Messages are folded until the rest fit COMPACT_TO of max_tokens; the last question
+        and answer are always kept verbatim. Returns whether anything was folded. If
+        summarize fails, the local extractive summary is used instead.
+        """
+        costs = [estimate_tokens(m['content']) for m in self.messages]
+        recent, cut = sum(costs), 0
+        if recent <= self.max_tokens:
+            return False
+        while recent > self.max_tokens * COMPACT_TO and cut < len(self.messages) - 2:
+            recent -= costs[cut]
+            cut += 1
+        if not cut:
+            return False
+        folded, self.messages = self.messages[:cut], self.messages[cut:]
+        try:
+            summary = summarize(self.summary, folded)
+        except Exception:
+            summary = extractive_summary(self.summary, folded)
+        self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+        return True
@@ -0,0 +1,127 @@
+import math
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Sequence, Set, Tuple
+
+from utils.manual_index import BM25_B, BM25_K1, tokenize
+from utils.prompt_compaction import estimate_tokens
+
+# Words per shingle; chunks sharing most of their shingles with earlier ones are near-duplicates
+SHINGLE_WORDS = 5
+DUPLICATE_CONTAINMENT = 0.8
+# Sentences this short ("Copy", headings) are never dropped as repeats
+MIN_SENTENCE_WORDS = 6
+# Weight of query-term relevance in the rerank score; the retrieval rank gets the rest
+LEXICAL_WEIGHT = 0.5
+SENTENCE_SPLIT = re.compile(r'((?<=[.!?])\s+|\n+)')
+
+def _hash(words: Sequence[str]) -> int:
+    return zlib.crc32(' '.join(words).encode('utf-8'))
+
+def _shingles(words: List[str]) -> Set[int]:
+    if len(words) <= SHINGLE_WORDS:
+        return {_hash(words)} if words else set()
+    return {_hash(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+@dataclass
+class PackedContext:
+    """Retrieved chunks after deduplication, reranking and packing, with the token counts before and after"""
+    chunks: List[str]
+    original_chunks: int
+    original_tokens: int
+    tokens: int
+    duplicates: int = 0
+    repeated_sentences: int = 0
+    over_budget: int = 0
+    separator: str = field(default="\n\n", repr=False)
+
+    @property
+    def text(self) -> str:
+        return self.separator.join(self.chunks)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def summary(self) -> str:
+        saved = self.saved_tokens / self.original_tokens * 100 if self.original_tokens else 0.0
+        return (f"{self.original_chunks} → {len(self.chunks)} chunks ({self.duplicates} near-duplicates, "
+                f"{self.repeated_sentences} repeated sentences, {self.over_budget} over budget); "
+                f"{self.original_tokens:,} → {self.tokens:,} tokens (saved {self.saved_tokens:,}, {saved:.0f}%)")
+
+def _drop_seen_sentences(chunk: str, seen: Set[int]) -> Tuple[str, int]:
+    """Remove sentences already seen in earlier chunks, keeping the chunk's own line breaks"""
+    parts = SENTENCE_SPLIT.split(chunk)
+    kept, dropped = [], 0
+    for i in range(0, len(parts), 2):
+        words = tokenize(parts[i])
+        if len(words) >= MIN_SENTENCE_WORDS:
+            digest = _hash(words)
+            if digest in seen:
+                dropped += 1
+                continue
+            seen.add(digest)
+        kept.append(parts[i] + (parts[i + 1] if i + 1 < len(parts) else ''))
+    return ''.join(kept).strip(), dropped
+
+def _relevance(query: str, chunks: List[str]) -> List[float]:
+    """BM25 of the query against the candidate chunks, scaled to a maximum of 1"""
+    terms = set(tokenize(query))
+    counts = [Counter(tokenize(chunk)) for chunk in chunks]
+    lengths = [sum(c.values()) for c in counts]
+    average = sum(lengths) / len(lengths) if lengths else 1.0
+    idf = {}
+    for term in terms:
+        frequency = sum(1 for c in counts if term in c)
+        idf[term] = math.log1p((len(chunks) - frequency + 0.5) / (frequency + 0.5))
+    scores = []
+    for c, length in zip(counts, lengths):
+        score = 0.0
+        for term in terms & c.keys():
+            tf = c[term]
+            score += idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / max(average, 1e-9)))
+        scores.append(score)
+    best = max(scores, default=0.0)
+    return [score / best if best > 0 else 0.0 for score in scores]
+
+def pack_context(query: str, chunks: Sequence[str], max_tokens: int, separator: str = "\n\n") -> PackedContext:
+    """Prepare retrieved chunks (best first) for the prompt.
+
+    Chunks whose word shingles are mostly (DUPLICATE_CONTAINMENT) found in the chunks
+    before them are dropped, as are sentences repeated from earlier chunks, such as the
+    overlap between neighbouring chunks. The rest are reranked by query-term relevance
+    and retrieval rank, and the best are packed until max_tokens is reached; a chunk that
+    doesn't fit is skipped in favour of smaller ones after it.
+    """
+    original_tokens = estimate_tokens(separator.join(chunks))
+    candidates, seen_shingles, seen_sentences = [], set(), set()
+    duplicates = repeated = 0
+    for rank, chunk in enumerate(chunks):
+        shingles = _shingles(tokenize(chunk))
+        if not shingles or len(shingles & seen_shingles) >= DUPLICATE_CONTAINMENT * len(shingles):
+            duplicates += 1
+            continue
+        seen_shingles |= shingles
+        text, dropped = _drop_seen_sentences(chunk, seen_sentences)
+        repeated += dropped
+        if text:
+            candidates.append((rank, text))
+
+    relevance = _relevance(query, [text for _, text in candidates])
+    scores = [LEXICAL_WEIGHT * lexical + (1 - LEXICAL_WEIGHT) * (1 - rank / len(chunks))
+              for lexical, (rank, _) in zip(relevance, candidates)]
+    ranked = [text for _, (_, text) in sorted(zip(scores, candidates), key=lambda item: -item[0])]
+
+    packed, used, over_budget = [], 0, 0
+    separator_tokens = estimate_tokens(separator)
+    for text in ranked:
+        cost = estimate_tokens(text) + (separator_tokens if packed else 0)
+        if used + cost > max_tokens:
+            over_budget += 1
+            continue
+        packed.append(text)
+        used += cost
+    return PackedContext(packed, len(chunks), original_tokens, estimate_tokens(separator.join(packed)),
+                         duplicates, repeated, over_budget, separator)
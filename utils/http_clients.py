@@ -0,0 +1,66 @@
+import asyncio
+import importlib.util
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import httpx
+import openai
+
+# HTTP/2 needs the optional h2 package; without it the same pools speak HTTP/1.1 with keep-alive
+HTTP2 = importlib.util.find_spec('h2') is not None
+# Long reads for slow reasoning models, short connects so an unreachable router fails fast
+TIMEOUT = httpx.Timeout(connect=10.0, read=300.0, write=30.0, pool=30.0)
+LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=120.0)
+# Retries of connection errors, 408/409/429 and 5xx responses, with exponential backoff
+MAX_RETRIES = 3
+R2R_TIMEOUT = 60.0
+
+_lock = threading.Lock()
+_clients: Dict[Hashable, Any] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Process-wide event loop running in a daemon thread.
+
+    Async clients bind their connection pools to the event loop they are first used in, so
+    a fresh loop per asyncio.run() would open new connections for every report. Requests
+    of the shared async clients must run on this loop.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='llm-client-loop', daemon=True).start()
+        return _loop
+
+def _shared(key: Hashable, create: Callable[[], Any]) -> Any:
+    with _lock:
+        if key not in _clients:
+            _clients[key] = create()
+        return _clients[key]
+
+def get_openai_client(base_url: str, api_key: str, headers: Optional[Dict[str, str]] = None) -> openai.OpenAI:
+    """Shared OpenAI-compatible client with a keep-alive connection pool, one per endpoint, key and headers"""
+    headers = dict(headers or {})
+    return _shared(('sync', base_url, api_key, tuple(sorted(headers.items()))), lambda: openai.OpenAI(
+        base_url=base_url, api_key=api_key, default_headers=headers, max_retries=MAX_RETRIES,
+        http_client=httpx.Client(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT, follow_redirects=True)))
+
+def get_async_openai_client(base_url: str, api_key: str,
+                            headers: Optional[Dict[str, str]] = None) -> openai.AsyncOpenAI:
+    """Shared async OpenAI-compatible client; use it on background_loop() only (generate_report does)"""
+    headers = dict(headers or {})
+    return _shared(('async', base_url, api_key, tuple(sorted(headers.items()))), lambda: openai.AsyncOpenAI(
+        base_url=base_url, api_key=api_key, default_headers=headers, max_retries=MAX_RETRIES,
+        http_client=httpx.AsyncClient(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT, follow_redirects=True)))
+
+def get_r2r_client(base_url: str, api_key: str):
+    """Shared R2R client; it keeps its HTTP connection pool across reruns and sessions"""
+    from r2r import R2RClient
+
+    def create():
+        # The client reads its key from the environment
+        os.environ["R2R_API_KEY"] = api_key
+        return R2RClient(base_url, timeout=R2R_TIMEOUT)
+    return _shared(('r2r', base_url, api_key), create)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+# Responses are kept in a local SQLite file, shared by all sessions and server restarts
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "superpro-webapp", "llm_responses.sqlite3"))
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+def make_key(model: str, template_version: str, prompt: Any, **params: Any) -> str:
+    """SHA-256 fingerprint of everything that determines a response.
+
+    prompt is the rendered prompt (or message list), so it covers the compacted input data;
+    template_version is bumped when the code around a template changes how it is used.
+    """
+    payload = json.dumps([model, template_version, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMResponseCache:
+    """Persistent cache of LLM responses with TTL and total-size (least recently used) eviction.
+
+    Every call opens its own SQLite connection, so the cache can be used from any
+    Streamlit session thread.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL)""")
+            self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None when missing or expired"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT response FROM responses WHERE key = ? AND created > ?",
+                                   (key, now - self.ttl_seconds)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return None if row is None else row[0]
+        finally:
+            conn.close()
+
+    def put(self, key: str, response: str):
+        """Store a response, then drop expired entries and the least recently used ones above max_bytes"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (key, response, size, now, now))
+                conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+                conn.execute("""DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total
+                                     FROM responses)
+                    WHERE total > ?)""", (self.max_bytes,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM responses")
+        finally:
+            conn.close()
+
+# Process-wide cache shared across sessions
+response_cache = LLMResponseCache()
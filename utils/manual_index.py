@@ -0,0 +1,248 @@
+"""In-process retrieval over the SuperPro Designer manual.
+
+An index directory holds the chunk texts, a memory-mapped float32 embedding matrix and
+a BM25 inverted index stored as flat postings arrays. Queries are scored with both and
+the scores are mixed, so retrieval takes milliseconds and works offline.
+
+Build an index from text or Markdown exports of the manual:
+    python -m utils.manual_index build manual_index manual/*.txt
+Query it:
+    python -m utils.manual_index search manual_index "How do I set up a batch process?"
+"""
+import json
+import math
+import os
+import re
+import sys
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Default location of the index, next to the app
+DEFAULT_INDEX_PATH = os.environ.get(
+    "MANUAL_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manual_index"))
+INDEX_VERSION = 1
+EMBEDDING_DIM = 384
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Weight of the embedding score in the hybrid score; BM25 gets the rest
+DENSE_WEIGHT = 0.5
+# Rows of the embedding matrix multiplied at once, bounding the memory of batched queries
+SCORE_BLOCK_ROWS = 65536
+WORD = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    return WORD.findall(text.casefold())
+
+class HashingEmbedder:
+    """Embeds text offline by hashing words and character 4-grams into a fixed number of dimensions.
+
+    Character n-grams make related word forms ("schedule", "scheduling") and typos land
+    close to each other, which the exact-term BM25 score misses. Hashes are CRC32, so
+    vectors are the same in every process.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    @staticmethod
+    def features(text: str) -> Counter:
+        words = tokenize(text)
+        features = Counter(words)
+        for word in words:
+            padded = f"<{word}>"
+            features.update(padded[i:i + 4] for i in range(len(padded) - 3))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-length float32 vectors, one row per text"""
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            for feature, count in self.features(text).items():
+                digest = zlib.crc32(feature.encode('utf-8'))
+                rows.append(row)
+                columns.append(digest % self.dim)
+                values.append((1.0 + math.log(count)) * (1.0 if digest & 0x80000000 else -1.0))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)),
+                  np.array(values, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into chunks of about max_chars at paragraph or sentence ends, overlapping by about overlap"""
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    pieces = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(s for s in re.split(r'(?<=[.!?])\s+', paragraph) if s)
+    chunks, current = [], ''
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ''
+            current = tail[tail.find(' ') + 1:] if ' ' in tail else tail
+        current = f"{current}\n\n{piece}" if current else piece
+        while len(current) > max_chars:  # A single sentence longer than a chunk
+            chunks.append(current[:max_chars])
+            current = current[max_chars - overlap:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_index(chunks: Sequence[str], path: str, sources: Optional[Sequence[str]] = None,
+                dim: int = EMBEDDING_DIM):
+    """Write the index of chunks to the directory path"""
+    os.makedirs(path, exist_ok=True)
+    sources = list(sources) if sources is not None else [''] * len(chunks)
+
+    vocabulary: Dict[str, int] = {}
+    term_ids, doc_ids, counts, lengths = [], [], [], []
+    for doc, chunk in enumerate(chunks):
+        terms = Counter(tokenize(chunk))
+        lengths.append(sum(terms.values()))
+        for term, count in terms.items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_ids.append(doc)
+            counts.append(count)
+    term_ids = np.array(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind='stable')
+    term_ids = term_ids[order]
+    doc_ids = np.array(doc_ids, dtype=np.int32)[order]
+    counts = np.array(counts, dtype=np.float32)[order]
+    lengths = np.array(lengths, dtype=np.float32)
+
+    # Postings store their final BM25 term weight, so a query only adds them up
+    frequencies = np.bincount(term_ids, minlength=len(vocabulary))
+    idf = np.log1p((len(chunks) - frequencies + 0.5) / (frequencies + 0.5)).astype(np.float32)
+    average_length = float(lengths.mean()) if len(chunks) else 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_ids] / max(average_length, 1e-9))
+    weights = idf[term_ids] * counts * (BM25_K1 + 1) / (counts + norm)
+    indptr = np.concatenate([[0], np.cumsum(frequencies)]).astype(np.int64)
+
+    np.save(os.path.join(path, 'embeddings.npy'), HashingEmbedder(dim).embed(chunks))
+    np.save(os.path.join(path, 'postings_indptr.npy'), indptr)
+    np.save(os.path.join(path, 'postings_docs.npy'), doc_ids)
+    np.save(os.path.join(path, 'postings_weights.npy'), weights.astype(np.float32))
+    with open(os.path.join(path, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+    with open(os.path.join(path, 'chunks.json'), 'w', encoding='utf-8') as f:
+        json.dump([{'text': text, 'source': source} for text, source in zip(chunks, sources)], f, ensure_ascii=False)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'dim': dim, 'chunks': len(chunks)}, f)
+
+def build_index_from_files(files: Iterable[str], path: str, max_chars: int = CHUNK_CHARS,
+                           overlap: int = CHUNK_OVERLAP) -> int:
+    """Chunk text files and index them, returning the number of chunks"""
+    chunks, sources = [], []
+    for file in files:
+        with open(file, encoding='utf-8', errors='replace') as f:
+            for chunk in chunk_text(f.read(), max_chars, overlap):
+                chunks.append(chunk)
+                sources.append(os.path.basename(file))
+    build_index(chunks, path, sources)
+    return len(chunks)
+
+class ManualIndex:
+    """Hybrid BM25 and embedding search over an index directory written by build_index.
+
+    The embedding matrix and postings arrays are memory-mapped, so loading is instant and
+    the operating system shares the pages between processes.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported manual index version {meta.get('version')} in {path}; rebuild the index")
+        self.path = path
+        self.embedder = HashingEmbedder(meta['dim'])
+        self.embeddings = np.load(os.path.join(path, 'embeddings.npy'), mmap_mode='r')
+        self.indptr = np.load(os.path.join(path, 'postings_indptr.npy'), mmap_mode='r')
+        self.doc_ids = np.load(os.path.join(path, 'postings_docs.npy'), mmap_mode='r')
+        self.weights = np.load(os.path.join(path, 'postings_weights.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'vocabulary.json'), encoding='utf-8') as f:
+            self.vocabulary = json.load(f)
+        with open(os.path.join(path, 'chunks.json'), encoding='utf-8') as f:
+            chunks = json.load(f)
+        self.texts = [chunk['text'] for chunk in chunks]
+        self.sources = [chunk['source'] for chunk in chunks]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                scores[self.doc_ids[start:end]] += self.weights[start:end]  # A term lists each chunk once
+        return scores
+
+    def _dense_scores(self, queries: Sequence[str]) -> np.ndarray:
+        """Cosine similarity of every query with every chunk, one row per query"""
+        vectors = self.embedder.embed(queries)
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = self.embeddings[start:start + SCORE_BLOCK_ROWS]
+            scores[:, start:start + len(block)] = vectors @ block.T
+        return scores
+
+    def search_many(self, queries: Sequence[str], limit: int = 10,
+                    dense_weight: float = DENSE_WEIGHT) -> List[List[Tuple[int, float]]]:
+        """Top chunks of each query as (chunk index, score), best first.
+
+        The embedding scores of all queries come from one matrix product. BM25 scores are
+        scaled by the best one of each query, so both parts range up to 1.
+        """
+        if not len(self):
+            return [[] for _ in queries]
+        dense = self._dense_scores(queries)
+        results = []
+        for row, query in enumerate(queries):
+            bm25 = self._bm25_scores(query)
+            best = bm25.max()
+            scores = dense_weight * dense[row] + (1 - dense_weight) * (bm25 / best if best > 0 else bm25)
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            results.append([(int(index), float(scores[index])) for index in top])
+        return results
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """Texts of the top chunks for query, best first"""
+        return [self.texts[index] for index, _ in self.search_many([query], limit)[0]]
+
+_lock = threading.Lock()
+_indexes: Dict[str, ManualIndex] = {}
+
+def load_manual_index(path: str = DEFAULT_INDEX_PATH) -> Optional[ManualIndex]:
+    """Process-wide index at path, or None when no index was built there"""
+    path = os.path.abspath(path)
+    with _lock:
+        if path not in _indexes:
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                return None
+            _indexes[path] = ManualIndex(path)
+        return _indexes[path]
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == 'build':
+        count = build_index_from_files(sys.argv[3:], sys.argv[2])
+        print(f"Indexed {count} chunks into {sys.argv[2]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'search':
+        index = ManualIndex(sys.argv[2])
+        for rank, (chunk, score) in enumerate(index.search_many([sys.argv[3]], 5)[0], start=1):
+            print(f"{rank}. [{score:.3f}] {index.sources[chunk]}: {index.texts[chunk][:200]!r}")
+    else:
+        print("Usage: python -m utils.manual_index build <index_dir> <text files...>\n"
+              "       python -m utils.manual_index search <index_dir> <query>")
+        sys.exit(1)
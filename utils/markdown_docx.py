@@ -0,0 +1,180 @@
+import re
+from typing import List, Optional, Sequence
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+
+HEADING = re.compile(r'^(#+)\s*(.*)$')
+BULLET_ITEM = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+NUMBERED_ITEM = re.compile(r'^(\s*)\d+[.)]\s+(.*)$')
+# Lines such as "2.1 Methods:" that some models write instead of a ## heading
+NUMBERED_SECTION = re.compile(r'^\d+\..*:')
+TABLE_ROW = re.compile(r'^\s*\|.*\|\s*$')
+TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+# Inline emphasis: ***bold italic***, **bold**, *italic*; unmatched markers stay literal
+INLINE = re.compile(r'\*\*\*(?=\S)(.+?)(?<=\S)\*\*\*|\*\*(?=\S)(.+?)(?<=\S)\*\*|\*(?=[^\s*])(.+?)(?<=[^\s*])\*')
+
+def create_document(title: str):
+    """Create an empty DOCX document with the report styles and title"""
+    doc = Document()
+
+    normal_style = doc.styles['Normal']
+    normal_style.font.size = Pt(12)
+    normal_style.paragraph_format.space_after = Pt(12)
+    normal_style.paragraph_format.line_spacing = 1.15
+
+    title_paragraph = doc.add_paragraph(title)
+    title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    title_run = title_paragraph.runs[0]
+    title_run.font.size = Pt(16)
+    title_run.font.bold = True
+
+    return doc
+
+def add_formatted_text(paragraph, text: str):
+    """Add text to a paragraph as runs, one per stretch of plain, bold or italic text"""
+    position = 0
+    for match in INLINE.finditer(text):
+        if match.start() > position:
+            paragraph.add_run(text[position:match.start()])
+        bold_italic, bold, italic = match.groups()
+        run = paragraph.add_run(bold_italic or bold or italic)
+        run.bold = bold_italic is not None or bold is not None
+        run.italic = bold_italic is not None or italic is not None
+        position = match.end()
+    if position < len(text):
+        paragraph.add_run(text[position:])
+
+def _table_cells(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in re.split(r'(?<!\\)\|', line)]
+
+def add_table(doc, header: Sequence[str], rows: Sequence[Sequence[str]]):
+    """Append a grid table with a bold header row; rows are padded or cut to the header width"""
+    columns = len(header)
+    table = doc.add_table(rows=1 + len(rows), cols=columns)
+    table.style = doc.styles['Table Grid']
+    cells = [cell for row in table.rows for cell in row.cells]
+    for index, text in enumerate(header):
+        paragraph = cells[index].paragraphs[0]
+        add_formatted_text(paragraph, text)
+        for run in paragraph.runs:
+            run.bold = True
+    for row_index, row in enumerate(rows, start=1):
+        for column, text in enumerate(list(row)[:columns]):
+            add_formatted_text(cells[row_index * columns + column].paragraphs[0], str(text))
+    return table
+
+class _Converter:
+    """Groups Markdown lines into blocks and writes each block to the document in one go"""
+
+    def __init__(self, doc, numbered_headings: bool):
+        self.doc = doc
+        self.numbered_headings = numbered_headings
+        self.style_ids = {}
+        # Open block: (kind, style name, list level) and its lines
+        self.kind = None
+        self.lines = []
+
+    def add_paragraph(self, style: str):
+        """Add an empty paragraph with the named style.
+
+        The style id is looked up once and set on the paragraph element: python-docx would
+        otherwise scan all styles for the default one on every style assignment.
+        """
+        if style not in self.style_ids:
+            self.style_ids[style] = self.doc.styles[style].style_id
+        paragraph = self.doc.add_paragraph()
+        paragraph._p.style = self.style_ids[style]
+        return paragraph
+
+    def flush(self):
+        if self.kind is None:
+            return
+        kind, style, level = self.kind
+        if kind == 'code':
+            paragraph = self.add_paragraph('No Spacing')
+            paragraph.paragraph_format.space_before = Pt(6)
+            paragraph.paragraph_format.space_after = Pt(6)
+            if self.lines:
+                paragraph.add_run(''.join(line + '\n' for line in self.lines))
+        elif kind == 'table':
+            rows = [_table_cells(line) for line in self.lines]
+            add_table(self.doc, rows[0], rows[2:])
+        else:
+            paragraph = self.add_paragraph(style)
+            if kind == 'item':
+                paragraph.paragraph_format.left_indent = Pt(18 * (level + 1))
+            add_formatted_text(paragraph, '\n'.join(self.lines))
+        self.kind, self.lines = None, []
+
+    def start(self, kind: str, style: Optional[str] = None, level: int = 0, line: Optional[str] = None):
+        self.flush()
+        self.kind = (kind, style, level)
+        self.lines = [] if line is None else [line]
+
+    def heading(self, text: str, level: int):
+        self.flush()
+        paragraph = self.add_paragraph(f'Heading {min(level, 3)}')
+        paragraph.paragraph_format.space_before = Pt(12)
+        add_formatted_text(paragraph, text)
+
+    def convert(self, content: str):
+        lines = content.split('\n')
+        for index, line in enumerate(lines):
+            line = line.rstrip()
+            kind = self.kind[0] if self.kind else None
+
+            if kind == 'code':
+                if line.startswith('```'):
+                    self.flush()
+                else:
+                    self.lines.append(line)
+                continue
+            if line.startswith('```'):
+                self.start('code')
+                continue
+            if not line:
+                self.flush()
+                continue
+            if kind == 'table':
+                if TABLE_ROW.match(line):
+                    self.lines.append(line)
+                    continue
+                self.flush()
+
+            heading = HEADING.match(line)
+            if heading:
+                self.heading(heading.group(2).strip(), len(heading.group(1)))
+            elif self.numbered_headings and NUMBERED_SECTION.match(line):
+                self.heading(line, 2)
+            elif TABLE_ROW.match(line) and index + 1 < len(lines) and TABLE_ROW.match(lines[index + 1]) \
+                    and TABLE_SEPARATOR.match(lines[index + 1]):
+                self.start('table', line=line)
+            elif BULLET_ITEM.match(line):
+                indent, text = BULLET_ITEM.match(line).groups()
+                self.start('item', 'List Bullet', len(indent) // 2, text.strip())
+            elif NUMBERED_ITEM.match(line):
+                indent, text = NUMBERED_ITEM.match(line).groups()
+                self.start('item', 'List Number', len(indent) // 2, text.strip())
+            elif kind == 'paragraph':
+                self.lines.append(line)
+            else:
+                self.start('paragraph', 'Normal', line=line)
+        self.flush()
+
+def add_markdown(doc, content: str, numbered_headings: bool = False):
+    """Append Markdown to the document: headings, paragraphs, bullet and numbered lists, code blocks,
+    tables and inline bold/italic.
+
+    Consecutive lines of a paragraph are kept as line breaks. With numbered_headings, lines like
+    "2.1 Methods:" become level 2 headings. Each call stands alone, so a report can be added
+    block by block as it is generated.
+    """
+    _Converter(doc, numbered_headings).convert(content)
+    return doc
@@ -0,0 +1,196 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+# Numbered report sections, e.g. "5. MATERIALS COST - PROCESS SUMMARY"
+SECTION_PATTERN = re.compile(r'^\d+\.\s')
+# Header placeholders pandas gives to columns without a name
+UNNAMED_COLUMN = re.compile(r'^Unnamed: \d+$')
+# Totals are kept when a section has to be shortened
+TOTAL_ROW = re.compile(r'^TOTAL\b', re.IGNORECASE)
+# Float representations written by str(float); SuperPro's own "1.200" thousands format has 3 decimals
+INTEGRAL_FLOAT = re.compile(r'^-?\d+\.0$')
+LONG_FLOAT = re.compile(r'^-?\d*\.\d{7,}$')
+# Pieces a BPE tokenizer rarely merges: letter runs, groups of up to 3 digits, single symbols
+TOKEN_PIECE = re.compile(r'[^\W\d_]+|\d{1,3}|[^\w\s]|_')
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the LLM token count of text, counting about 4 letters per token"""
+    return sum(math.ceil(len(piece) / 4) for piece in TOKEN_PIECE.findall(text))
+
+def _compact_cell(cell: str) -> str:
+    cell = cell.strip()
+    if UNNAMED_COLUMN.match(cell):
+        return ''
+    if INTEGRAL_FLOAT.match(cell):
+        return cell[:-2]
+    if LONG_FLOAT.match(cell):
+        return f"{float(cell):.6g}"
+    return cell
+
+@dataclass
+class _Section:
+    heading: Optional[str]
+    rows: List[str]
+
+    def tokens(self) -> int:
+        return estimate_tokens('\n'.join(self.lines()))
+
+    def lines(self) -> List[str]:
+        return ([self.heading] if self.heading is not None else []) + self.rows
+
+@dataclass
+class CompactText:
+    """Compacted prompt data with the token counts before and after"""
+    text: str
+    original_tokens: int
+    tokens: int
+    dropped_sections: int = 0
+    omitted_rows: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def summary(self) -> str:
+        saved = self.saved_tokens / self.original_tokens * 100 if self.original_tokens else 0.0
+        return f"{self.original_tokens:,} → {self.tokens:,} tokens (saved {self.saved_tokens:,}, {saved:.0f}%)"
+
+def _split_sections(text: str) -> List[_Section]:
+    """Compact every row and group the rows by numbered section heading.
+
+    Repeated rows (e.g. table headers repeated on every page) are dropped within a section.
+    Single-cell rows such as "Vessel Volume = 1,23 m3" describe the row above them, so
+    those are only dropped when they repeat the previous row.
+    """
+    sections = [_Section(None, [])]
+    seen = set()
+    for line in text.split('\n'):
+        cells = [cell for cell in map(_compact_cell, line.split('\t')) if cell]
+        if not cells:
+            continue
+        row = '\t'.join(cells)
+        if SECTION_PATTERN.match(row):
+            sections.append(_Section(row, []))
+            seen = set()
+            continue
+        rows = sections[-1].rows
+        if (len(cells) > 1 and row in seen) or (rows and rows[-1] == row):
+            continue
+        seen.add(row)
+        rows.append(row)
+    return [section for section in sections if section.heading is not None or section.rows]
+
+def _omission_note(rows: int) -> str:
+    return f"... {rows} more rows omitted"
+
+def _shorten(section: _Section, max_tokens: int) -> int:
+    """Keep leading rows and totals of the section within max_tokens, returning the number of rows removed.
+
+    The budget covers the heading and the omission note; totals are dropped too when they
+    don't fit. The section can still exceed max_tokens when its heading and note alone do.
+    """
+    # A note for fewer rows is never longer than one for all of them
+    budget = max_tokens - estimate_tokens(section.heading or '') - estimate_tokens(_omission_note(len(section.rows)))
+    totals = [row for row in section.rows if TOTAL_ROW.match(row)]
+    totals_cost = sum(estimate_tokens(row) for row in totals)
+    if totals_cost <= budget:
+        budget -= totals_cost
+    else:
+        totals = []
+    kept = []
+    for row in section.rows:
+        if TOTAL_ROW.match(row):
+            continue
+        cost = estimate_tokens(row)
+        if cost > budget:
+            break
+        kept.append(row)
+        budget -= cost
+    omitted = len(section.rows) - len(kept) - len(totals)
+    if omitted:
+        section.rows = kept + [_omission_note(omitted)] + totals
+    return omitted
+
+def compact_table_text(text: str, max_tokens: Optional[int] = None,
+                       sections: Optional[Iterable[str]] = None) -> CompactText:
+    """Compact the tab-separated text of report sheets before it goes into a prompt.
+
+    Cells are stripped, unnamed column headers and float noise are removed and repeated rows
+    are dropped. With sections, only numbered sections whose heading matches one of the
+    regex patterns are kept. With max_tokens, the budget is shared between sections: small
+    sections are kept whole, the largest ones are cut to their share, and sections whose
+    heading alone exceeds their share are dropped, so the result stays within max_tokens.
+    """
+    original_tokens = estimate_tokens(text)
+    parts = _split_sections(text)
+
+    dropped = 0
+    if sections is not None:
+        patterns = [re.compile(pattern, re.IGNORECASE) for pattern in sections]
+        kept = [part for part in parts
+                if part.heading is None or any(pattern.search(part.heading) for pattern in patterns)]
+        dropped = len(parts) - len(kept)
+        parts = kept
+
+    omitted = 0
+    if max_tokens is not None:
+        costs = [part.tokens() for part in parts]
+        if sum(costs) > max_tokens:
+            # Water-filling: sections below the fair share keep everything, the rest split what's left
+            remaining, order = max_tokens, sorted(range(len(parts)), key=costs.__getitem__)
+            too_small = set()
+            for position, index in enumerate(order):
+                share = remaining // (len(order) - position)
+                if costs[index] > share:
+                    removed = _shorten(parts[index], share)
+                    costs[index] = parts[index].tokens()
+                    if costs[index] > share:  # Counted as a dropped section instead
+                        too_small.add(index)
+                        costs[index] = 0
+                    else:
+                        omitted += removed
+                remaining -= costs[index]
+            dropped += len(too_small)
+            parts = [part for index, part in enumerate(parts) if index not in too_small]
+
+    compacted = '\n'.join(line for part in parts for line in part.lines())
+    return CompactText(compacted, original_tokens, estimate_tokens(compacted), dropped, omitted)
+
+def chunk_sections(sections: List[str], max_tokens: int, header_lines: int = 0) -> List[str]:
+    """Pack consecutive text sections into chunks of at most max_tokens each.
+
+    Sections are kept whole where possible and separated by a blank line; a section
+    larger than max_tokens is split at line boundaries (a single line over the budget
+    becomes a chunk of its own). Its first header_lines lines (e.g. its title and table
+    header) stay together, and every chunk continuing the section starts with them again,
+    the title marked as continued, so each chunk says what its rows belong to.
+    """
+    chunks, current, current_tokens = [], '', 0
+    for section in sections:
+        tokens = estimate_tokens(section)
+        if tokens <= max_tokens:
+            pieces = [section]
+            continued = ''
+        else:
+            lines = section.split('\n')
+            head = lines[:header_lines]
+            pieces = (['\n'.join(head)] if head else []) + lines[len(head):]
+            continued = '\n'.join([f"{head[0]} (continued)"] + head[1:]) if head else ''
+            if estimate_tokens(continued) > max_tokens // 2:  # Leave room for rows
+                continued = ''
+        separator = '\n\n'
+        for index, piece in enumerate(pieces):
+            cost = estimate_tokens(piece)
+            if current and current_tokens + cost > max_tokens:
+                chunks.append(current)
+                current, current_tokens = '', 0
+                if continued and index > 0:
+                    current, current_tokens = continued, estimate_tokens(continued)
+            current = current + separator + piece if current else piece
+            current_tokens += cost
+            separator = '\n'  # Lines of a split section stay together
+    if current:
+        chunks.append(current)
+    return chunks
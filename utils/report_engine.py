@@ -0,0 +1,193 @@
+import asyncio
+import queue
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from utils.http_clients import background_loop
+from utils.llm_cache import LLMResponseCache, make_key
+
+# A prompt is either fixed text or built from the output of the sections it depends on
+Prompt = Union[str, Callable[[Dict[str, str]], str]]
+
+@dataclass
+class ReportSection:
+    """One LLM-generated part of a report.
+
+    client is an openai.AsyncOpenAI instance (a shared one from utils.http_clients when
+    run through generate_report). depends_on names earlier sections whose text is passed
+    to a callable prompt; the section waits only on those sections. template_version is
+    part of the response cache key.
+    """
+    name: str
+    client: Any
+    model: str
+    prompt: Prompt
+    depends_on: Tuple[str, ...] = ()
+    template_version: str = "1"
+
+    def build_prompt(self, context: Dict[str, str]) -> str:
+        return self.prompt(context) if callable(self.prompt) else self.prompt
+
+def _validate_sections(sections: List[ReportSection]):
+    """Require unique names and dependencies on earlier sections only (which rules out cycles)"""
+    seen = set()
+    for section in sections:
+        if section.name in seen:
+            raise ValueError(f"Duplicate report section: {section.name}")
+        missing = [dep for dep in section.depends_on if dep not in seen]
+        if missing:
+            raise ValueError(f"Section {section.name} depends on unknown or later sections: {', '.join(missing)}")
+        seen.add(section.name)
+
+async def generate_sections(sections: List[ReportSection],
+                            on_section_done: Optional[Callable[[str, str], None]] = None,
+                            on_delta: Optional[Callable[[str, str], None]] = None,
+                            cache: Optional[LLMResponseCache] = None,
+                            read_cache: bool = True,
+                            max_concurrency: Optional[int] = None) -> Dict[str, str]:
+    """Generate all sections concurrently, each one starting as soon as its dependencies finish.
+
+    With on_delta, responses are streamed and every received piece of text is passed on
+    together with the section name. With cache, responses are looked up by model, template
+    version and prompt before calling the model (unless read_cache is False) and stored
+    afterwards; a cached section is passed to on_delta in one piece. Returns the section
+    texts keyed by name, in the order of sections. The first failing request raises;
+    sections still running are cancelled. max_concurrency limits the number of requests
+    in flight; sections waiting on dependencies don't count.
+    """
+    _validate_sections(sections)
+    tasks = {}
+    slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def request(section: ReportSection, messages: List[Dict[str, str]]) -> str:
+        if on_delta is None:
+            response = await section.client.chat.completions.create(model=section.model, messages=messages)
+            return response.choices[0].message.content
+        parts = []
+        stream = await section.client.chat.completions.create(model=section.model, messages=messages, stream=True)
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_delta(section.name, delta)
+        return ''.join(parts)
+
+    async def run(section: ReportSection) -> str:
+        context = {dep: await tasks[dep] for dep in section.depends_on}
+        messages = [{"role": "user", "content": section.build_prompt(context)}]
+        key = make_key(section.model, section.template_version, messages)
+        text = cache.get(key) if cache is not None and read_cache else None
+        if text is not None:
+            if on_delta is not None:
+                on_delta(section.name, text)
+        else:
+            if slots is not None:
+                await slots.acquire()
+            try:
+                text = await request(section, messages)
+            finally:
+                if slots is not None:
+                    slots.release()
+            if cache is not None and text:
+                cache.put(key, text)
+        if on_section_done is not None:
+            on_section_done(section.name, text)
+        return text
+
+    for section in sections:
+        tasks[section.name] = asyncio.ensure_future(run(section))
+
+    try:
+        results = await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return dict(zip(tasks, results))
+
+def generate_report(sections: List[ReportSection],
+                    on_section_done: Optional[Callable[[str, str], None]] = None,
+                    on_delta: Optional[Callable[[str, str], None]] = None,
+                    cache: Optional[LLMResponseCache] = None,
+                    read_cache: bool = True,
+                    max_concurrency: Optional[int] = None) -> Dict[str, str]:
+    """Synchronous entry point for Streamlit scripts, which run outside an event loop.
+
+    The sections are generated on the shared client loop, so the pooled async clients keep
+    their connections between reports. Callbacks are passed back and run in the calling
+    thread, where Streamlit elements can be updated.
+    """
+    calls = queue.SimpleQueue()
+
+    def deferred(callback):
+        return None if callback is None else lambda *args: calls.put((callback, args))
+
+    future = asyncio.run_coroutine_threadsafe(
+        generate_sections(sections, deferred(on_section_done), deferred(on_delta), cache, read_cache,
+                          max_concurrency),
+        background_loop())
+    future.add_done_callback(lambda _: calls.put(None))
+    try:
+        for callback, args in iter(calls.get, None):
+            callback(*args)
+    except BaseException:
+        future.cancel()
+        raise
+    return future.result()
+
+class IncrementalMarkdown:
+    """Splits streamed Markdown of report sections into blocks that can be converted right away.
+
+    A block ends where the next heading outside a code block starts, so converting the
+    blocks one at a time gives the same document as converting the whole text. Blocks are
+    passed to write_block in report order: those of a section that finishes early are held
+    back until all sections before it are finished.
+    """
+
+    def __init__(self, section_names: List[str], write_block: Callable[[str], None]):
+        self.section_names = list(section_names)
+        self.write_block = write_block
+        self._partial = {name: '' for name in self.section_names}  # Incomplete last line
+        self._lines = {name: [] for name in self.section_names}  # Lines of the open block
+        self._in_code = {name: False for name in self.section_names}
+        self._ready = {name: [] for name in self.section_names}
+        self._finished = set()
+        self._head = 0  # Index of the section currently being written
+
+    def feed(self, name: str, delta: str):
+        lines = (self._partial[name] + delta).split('\n')
+        self._partial[name] = lines.pop()
+        for line in lines:
+            self._add_line(name, line)
+        self._flush()
+
+    def finish(self, name: str):
+        """Mark a section as complete, releasing its last block"""
+        if self._partial[name]:
+            self._add_line(name, self._partial[name])
+            self._partial[name] = ''
+        self._close_block(name)
+        self._finished.add(name)
+        self._flush()
+
+    def _add_line(self, name: str, line: str):
+        if line.startswith('```'):
+            self._in_code[name] = not self._in_code[name]
+        elif line.startswith('#') and not self._in_code[name]:
+            self._close_block(name)
+        self._lines[name].append(line)
+
+    def _close_block(self, name: str):
+        if self._lines[name]:
+            self._ready[name].append('\n'.join(self._lines[name]))
+            self._lines[name] = []
+
+    def _flush(self):
+        while self._head < len(self.section_names):
+            name = self.section_names[self._head]
+            for block in self._ready[name]:
+                self.write_block(block)
+            self._ready[name] = []
+            if name not in self._finished:
+                break
+            self._head += 1
@@ -0,0 +1,68 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, List
+
+from utils.llm_cache import DEFAULT_CACHE_PATH, LLMResponseCache, make_key
+
+# Search results live in their own file: the TTL eviction of a cache applies to its whole table
+RETRIEVAL_CACHE_PATH = os.environ.get(
+    "RETRIEVAL_CACHE_PATH", os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "retrieval_results.sqlite3"))
+# Shorter than for answers, so updates of the knowledge base show up within a day
+RETRIEVAL_TTL_SECONDS = 24 * 3600
+RETRIEVAL_MAX_BYTES = 50 * 1024 * 1024
+WORD = re.compile(r'\w+')
+
+def normalize_query(query: str) -> str:
+    """Form of a question used in cache keys: case, spacing and punctuation don't matter.
+
+    "How do I set up a batch process?" and "how do i set up a  batch process" give the
+    same key. Accents are kept, as they carry meaning in other languages.
+    """
+    return ' '.join(WORD.findall(unicodedata.normalize('NFKC', query).casefold()))
+
+class RetrievalCache:
+    """Retrieved chunk texts by normalized query, with TTL and size (least recently used) eviction.
+
+    Shared by all sessions of the server process. When several sessions search for the
+    same question at once, only the first one calls the search; the others wait for its
+    result.
+    """
+
+    def __init__(self, store: LLMResponseCache, version: str = "1"):
+        self.store = store
+        self.version = version
+        self._lock = threading.Lock()
+        self._searches: Dict[str, threading.Lock] = {}
+
+    def search(self, query: str, search: Callable[[str], List[str]], read_cache: bool = True,
+               **params) -> List[str]:
+        """Return the chunks for query from the cache, or from search(query) and store them.
+
+        params are the search settings that change the results (e.g. limit); they are part
+        of the key. With read_cache False the search always runs and refreshes the entry.
+        """
+        key = make_key("retrieval", self.version, normalize_query(query), **params)
+        if read_cache:
+            cached = self.store.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        with self._lock:
+            lock = self._searches.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                cached = self.store.get(key) if read_cache else None  # Set by a search that ran meanwhile
+                if cached is not None:
+                    return json.loads(cached)
+                chunks = search(query)
+                self.store.put(key, json.dumps(chunks, ensure_ascii=False))
+                return chunks
+        finally:
+            with self._lock:
+                if self._searches.get(key) is lock:
+                    del self._searches[key]
+
+# Process-wide cache shared across sessions
+retrieval_cache = RetrievalCache(LLMResponseCache(RETRIEVAL_CACHE_PATH, RETRIEVAL_TTL_SECONDS, RETRIEVAL_MAX_BYTES))
@@ -0,0 +1,79 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import is_dataclass
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+# Default memory budget for parsed workbooks kept across Streamlit reruns
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def file_digest(data: bytes) -> str:
+    """SHA-256 of the file content, used as the cache key of an uploaded workbook"""
+    return hashlib.sha256(data).hexdigest()
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory used by a cached value (DataFrames, arrays, containers, dataclasses)"""
+    if hasattr(value, 'memory_usage'):  # pandas DataFrame / Series
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+class WorkbookCache:
+    """Thread-safe LRU cache of parsed workbooks, bounded by the estimated memory of its entries.
+
+    A single instance lives at module level, so it is shared by all Streamlit sessions
+    of the server process. Cached values are shared as well and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """Store a value, evicting least recently used entries to stay within max_bytes"""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+# Process-wide cache shared across sessions
+workbook_cache = WorkbookCache()